@@ -0,0 +1,75 @@
+import argparse
+import datetime
+import json
+import platform
+import sys
+import typing
+
+from benchmarks import codec, dispatch, memory, store
+
+SUITES = {
+    'dispatch': (dispatch.run, {'count': 1_000, 'depth': 100}),
+    'store': (store.run, {'sizes': (10_000,)}),
+    'memory': (memory.run, {'count': 10_000}),
+    'codec': (codec.run, {'count': 1_000}),
+}
+
+
+def _flatten(results: typing.Dict[str, typing.Any], prefix: str = '') -> typing.Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(baseline: typing.Dict[str, typing.Any], current: typing.Dict[str, typing.Any]) -> typing.Dict[str, float]:
+    before = _flatten(baseline['results'])
+    after = _flatten(current['results'])
+    return {key: after[key] / before[key] for key in sorted(before.keys() & after.keys()) if before[key]}
+
+
+def main(arguments: typing.Optional[typing.List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Run the corx benchmark suites.')
+    parser.add_argument('suites', nargs='*', metavar='suite', help=f'suites to run: {", ".join(SUITES)} (default: all)')
+    parser.add_argument('--quick', action='store_true', help='use small workloads for a smoke run')
+    parser.add_argument('--output', help='write the JSON results to this file')
+    parser.add_argument('--compare', help='report ratios against a previous JSON result file')
+    options = parser.parse_args(arguments)
+
+    unknown = set(options.suites) - SUITES.keys()
+    if unknown:
+        parser.error(f'unknown suites: {", ".join(sorted(unknown))}')
+
+    results = {}
+    for name in options.suites or SUITES:
+        run, quick = SUITES[name]
+        print(f'running {name}', file=sys.stderr)
+        results[name] = run(**quick) if options.quick else run()
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'quick': options.quick,
+        },
+        'results': results,
+    }
+
+    if options.compare:
+        with open(options.compare) as baseline:
+            report['ratios'] = compare(json.load(baseline), report)
+
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as output:
+            output.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import dataclasses
+import json
+import pickle
+import timeit
+import typing
+
+import corx
+from corx.codec import Codec
+
+
+@dataclasses.dataclass
+class Deposited(corx.event.Event):
+    aggregate_id: str
+    amount: int
+    rate: float
+    reference: typing.Optional[str]
+
+    def apply(self, aggregate):
+        ...
+
+
+def _to_json(event: Deposited) -> bytes:
+    return json.dumps({'uuid': event.uuid, 'timestamp': event.timestamp, 'version': event.version, **dataclasses.asdict(event)}).encode()
+
+
+def run(count: int = 10_000, repeat: int = 5) -> typing.Dict[str, typing.Dict[str, float]]:
+    codec = Codec()
+    events = [Deposited(aggregate_id=f'account-{index % 100}', amount=index, rate=0.25, reference=None) for index in range(count)]
+
+    encoders = {
+        'codec': (lambda: codec.encode_many(events), codec.decode_many),
+        'pickle': (lambda: pickle.dumps(events, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+        'json': (lambda: [_to_json(event) for event in events], lambda encoded: [json.loads(item) for item in encoded]),
+    }
+
+    results = {}
+    for name, (encode, decode) in encoders.items():
+        encoded = encode()
+        results[name] = {
+            'encode_us': min(timeit.repeat(encode, number=1, repeat=repeat)) / count * 1e6,
+            'decode_us': min(timeit.repeat(lambda: decode(encoded), number=1, repeat=repeat)) / count * 1e6,
+            'bytes': (len(encoded) if isinstance(encoded, bytes) else sum(map(len, encoded))) / count,
+        }
+
+    return results
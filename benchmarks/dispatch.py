@@ -0,0 +1,112 @@
+import asyncio
+import dataclasses
+import time
+import typing
+
+from corx.command import Command, handles
+from corx.dispatcher import get_dispatcher
+from corx.event import Event, reacts
+
+
+@dataclasses.dataclass
+class Increment(Command):
+    amount: int
+
+
+@dataclasses.dataclass
+class IncrementAsync(Command):
+    amount: int
+
+
+@dataclasses.dataclass
+class Ping(Command):
+    remaining: int
+
+
+@dataclasses.dataclass
+class Pong(Event):
+    remaining: int
+
+    def apply(self, aggregate):
+        ...
+
+
+@handles(Increment)
+def handle_increment(command: Increment):
+    ...
+
+
+@handles(IncrementAsync)
+async def handle_increment_async(command: IncrementAsync):
+    ...
+
+
+@handles(Ping)
+async def handle_ping(command: Ping):
+    get_dispatcher().dispatch(Pong(remaining=command.remaining))
+
+
+@reacts(Pong)
+async def react_pong(event: Pong):
+    if event.remaining > 1:
+        get_dispatcher().dispatch(Ping(remaining=event.remaining - 1))
+
+
+def _fan_out_event(listeners: int) -> typing.Type[Event]:
+    event = dataclasses.make_dataclass(f'FanOut{listeners}', [('value', int)], bases=(Event,), namespace={'apply': lambda self, aggregate: None})
+    for _ in range(listeners):
+        reacts(event)(lambda event_: None)
+    return event
+
+
+def _rate(count: int, elapsed: float) -> typing.Dict[str, float]:
+    return {'per_second': count / elapsed, 'us': elapsed / count * 1e6}
+
+
+def _best(function: typing.Callable[[], float], repeat: int) -> float:
+    return min(function() for _ in range(repeat))
+
+
+def _timed(function: typing.Callable[[], None]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def run(count: int = 10_000, depth: int = 1_000, repeat: int = 3) -> typing.Dict[str, typing.Dict[str, float]]:
+    dispatcher = get_dispatcher()
+    results = {}
+
+    def sync_dispatch():
+        for index in range(count):
+            dispatcher.dispatch(Increment(amount=index))
+
+    results['sync_dispatch'] = _rate(count, _best(lambda: _timed(sync_dispatch), repeat))
+
+    def sync_batch():
+        dispatcher.dispatch(*[Increment(amount=index) for index in range(count)])
+
+    results['sync_batch'] = _rate(count, _best(lambda: _timed(sync_batch), repeat))
+
+    async def async_dispatch():
+        for index in range(count):
+            await dispatcher.dispatch_async(IncrementAsync(amount=index))
+
+    results['async_dispatch'] = _rate(count, _best(lambda: _timed(lambda: asyncio.run(async_dispatch())), repeat))
+
+    async def async_nowait():
+        for index in range(count):
+            dispatcher.dispatch_nowait(IncrementAsync(amount=index))
+        await dispatcher.dispatch_async()
+
+    results['async_nowait'] = _rate(count, _best(lambda: _timed(lambda: asyncio.run(async_nowait())), repeat))
+
+    for listeners in (1, 10, 100):
+        event = _fan_out_event(listeners)
+        events = max(count // listeners, 100)
+        elapsed = _best(lambda: _timed(lambda: dispatcher.dispatch(*[event(value=index) for index in range(events)])), repeat)
+        results[f'fan_out_{listeners}'] = {**_rate(events, elapsed), 'deliveries_per_second': events * listeners / elapsed}
+
+    results['ping_pong'] = {**_rate(depth * 2, _best(lambda: _timed(lambda: dispatcher.dispatch(Ping(remaining=depth))), repeat)), 'depth': depth}
+
+    return results
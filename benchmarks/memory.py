@@ -0,0 +1,51 @@
+import dataclasses
+import gc
+import tracemalloc
+import typing
+
+from corx.codec import Codec
+from corx.command import Command
+from corx.event import Event
+
+
+@dataclasses.dataclass
+class Transfer(Command):
+    source: str
+    target: str
+    amount: int
+
+
+@dataclasses.dataclass
+class Transferred(Event):
+    source: str
+    target: str
+    amount: int
+
+    def apply(self, aggregate):
+        ...
+
+
+def _allocated(factory: typing.Callable[[int], typing.Any], count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        messages = [factory(index) for index in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    del messages
+    return (after - before) / count
+
+
+def run(count: int = 100_000) -> typing.Dict[str, typing.Dict[str, float]]:
+    codec = Codec()
+    source, target = 'account-1', 'account-2'
+    event = Transferred(source=source, target=target, amount=1)
+
+    return {
+        'command': {'bytes': _allocated(lambda index: Transfer(source=source, target=target, amount=1), count)},
+        'event': {'bytes': _allocated(lambda index: Transferred(source=source, target=target, amount=1), count)},
+        'encoded_event': {'bytes': len(codec.encode(event))},
+    }
@@ -0,0 +1,51 @@
+import dataclasses
+import time
+import typing
+
+from corx.event import Event, RuntimeEventStore
+
+
+@dataclasses.dataclass
+class Recorded(Event):
+    aggregate_id: str
+    value: int
+
+    def apply(self, aggregate):
+        ...
+
+
+@dataclasses.dataclass
+class Marked(Event):
+    value: int
+
+    def apply(self, aggregate):
+        ...
+
+
+def _best(function: typing.Callable[[], typing.Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(sizes: typing.Sequence[int] = (10_000, 100_000, 1_000_000), repeat: int = 5) -> typing.Dict[str, typing.Dict[str, float]]:
+    results = {}
+    for size in sizes:
+        store = RuntimeEventStore()
+        start = time.perf_counter()
+        for index in range(size):
+            store.append(Recorded(aggregate_id=f'aggregate-{index % 1000}', value=index) if index % 10 else Marked(value=index))
+        append = time.perf_counter() - start
+
+        results[str(size)] = {
+            'append_us': append / size * 1e6,
+            'get_ms': _best(store.get, repeat) * 1e3,
+            'get_by_type_ms': _best(lambda: store.get_by_type(Marked), repeat) * 1e3,
+            'get_by_aggregate_us': _best(lambda: store.get_by_aggregate('aggregate-1'), repeat) * 1e6,
+            'get_latest_by_type_us': _best(lambda: store.get_latest_by_type(Marked), repeat) * 1e6,
+        }
+
+    return results
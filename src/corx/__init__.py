@@ -1,17 +1,26 @@
-from . import command
-from . import dispatcher
-from . import event
-from . import test
+import importlib
 
 __all__ = [
     'test',
+    'codec',
     'command',
     'event',
+    'metrics',
     'dispatcher',
+    'projection',
+    'repository',
+    'sharding',
+    'store',
+    'subscription',
 ]
 
 
-__dispatcher = dispatcher.get_dispatcher()
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module(f'{__name__}.{name}')
 
-__dispatcher.register_executor(command.Command, command.CommandExecutor())
-__dispatcher.register_executor(event.Event, event.EventExecutor())
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
@@ -0,0 +1,231 @@
+import dataclasses
+import inspect
+import pickle
+import struct
+import typing
+import zlib
+
+from corx.dispatcher import Dispatchable
+from corx.event import Event
+
+__all__ = [
+    'Codec',
+    'TypeRegistry',
+    'get_registry',
+]
+
+_TYPE_ID = struct.Struct('<I')
+_LENGTH = struct.Struct('<I')
+_NONE = 0xFFFFFFFF
+_LOW = 0xFFFFFFFFFFFFFFFF
+
+_FIXED = {
+    int: 'q',
+    float: 'd',
+    bool: '?',
+}
+
+_Encode = typing.Callable[[typing.Any], bytes]
+_Decode = typing.Callable[[memoryview], typing.Any]
+
+
+def _scalar(code: str) -> typing.Tuple[_Encode, _Decode]:
+    scalar = struct.Struct('<' + code)
+    return scalar.pack, lambda view: scalar.unpack(view)[0]
+
+
+def _codecs(annotation: typing.Any) -> typing.Tuple[_Encode, _Decode]:
+    arguments = typing.get_args(annotation)
+    if typing.get_origin(annotation) is typing.Union and len(arguments) == 2 and type(None) in arguments:
+        annotation = arguments[0] if arguments[1] is type(None) else arguments[1]
+
+    if annotation in _FIXED:
+        return _scalar(_FIXED[annotation])
+    if annotation is str:
+        return lambda value: value.encode(), lambda view: str(view, 'utf-8')
+    if annotation is bytes:
+        return bytes, bytes
+    if annotation is memoryview:
+        return bytes, lambda view: view
+
+    return lambda value: pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads
+
+
+class _Schema():
+    def __init__(self, message_type: typing.Type[Dispatchable], type_id: int):
+        hints = typing.get_type_hints(message_type)
+
+        self.message_type = message_type
+        self.type_id = type_id
+        self.versioned = issubclass(message_type, Event)
+        self.fixed: typing.List[str] = []
+        self.variable: typing.List[typing.Tuple[str, _Encode, _Decode]] = []
+
+        codes = []
+        for field in dataclasses.fields(message_type):
+            annotation = hints.get(field.name, typing.Any)
+            if annotation in _FIXED:
+                self.fixed.append(field.name)
+                codes.append(_FIXED[annotation])
+            else:
+                self.variable.append((field.name, *_codecs(annotation)))
+
+        self.header_size = 5 if self.versioned else 4
+        self.has_dict = '__dict__' in dir(message_type)
+        self.head = struct.Struct('<IQQd' + ('q' if self.versioned else '') + ''.join(codes))
+
+    def encode(self, message: Dispatchable, chunks: typing.List[bytes]) -> None:
+        values = [self.type_id, message._id >> 64, message._id & _LOW, message.timestamp]
+        if self.versioned:
+            values.append(message.version)
+        values.extend(getattr(message, name) for name in self.fixed)
+        chunks.append(self.head.pack(*values))
+
+        for name, encode, _ in self.variable:
+            value = getattr(message, name)
+            if value is None:
+                chunks.append(_LENGTH.pack(_NONE))
+            else:
+                data = encode(value)
+                chunks.append(_LENGTH.pack(len(data)))
+                chunks.append(data)
+
+    def decode(self, view: memoryview, offset: int) -> typing.Tuple[Dispatchable, int]:
+        values = self.head.unpack_from(view, offset)
+        offset += self.head.size
+
+        fields = dict(zip(self.fixed, values[self.header_size:]))
+        for name, _, decode in self.variable:
+            length, = _LENGTH.unpack_from(view, offset)
+            offset += _LENGTH.size
+            if length == _NONE:
+                fields[name] = None
+            else:
+                fields[name] = decode(view[offset:offset + length])
+                offset += length
+
+        setattr_ = object.__setattr__
+        message = object.__new__(self.message_type)
+        setattr_(message, '_id', (values[1] << 64) | values[2])
+        setattr_(message, 'timestamp', values[3])
+        if self.versioned:
+            setattr_(message, 'version', values[4])
+            setattr_(message, 'expected_version', None)
+
+        if self.has_dict:
+            message.__dict__.update(fields)
+        else:
+            for name, value in fields.items():
+                setattr_(message, name, value)
+
+        return message, offset
+
+
+class TypeRegistry():
+    def __init__(self):
+        self._ids: typing.Dict[type, int] = {}
+        self._types: typing.Dict[int, type] = {}
+
+    def register(self, message_type: typing.Type[Dispatchable], type_id: typing.Optional[int] = None) -> int:
+        if type_id is None:
+            module = '__main__' if message_type.__module__ == '__mp_main__' else message_type.__module__
+            type_id = zlib.crc32(f'{module}:{message_type.__qualname__}'.encode())
+
+        registered = self._types.get(type_id)
+        if registered is not None and registered is not message_type:
+            raise Exception(f'Type id {type_id} of {message_type.__qualname__} is already taken by {registered.__qualname__}.')
+
+        previous = self._ids.get(message_type)
+        if previous is not None and previous != type_id:
+            raise Exception(f'{message_type.__qualname__} is already registered with type id {previous}.')
+
+        self._ids[message_type] = type_id
+        self._types[type_id] = message_type
+        return type_id
+
+    def type_id(self, message_type: typing.Type[Dispatchable]) -> int:
+        type_id = self._ids.get(message_type)
+        if type_id is None:
+            type_id = self.register(message_type)
+        return type_id
+
+    def resolve(self, type_id: int) -> typing.Type[Dispatchable]:
+        message_type = self._types.get(type_id)
+        if message_type is None:
+            self._discover()
+            message_type = self._types.get(type_id)
+            if message_type is None:
+                raise Exception(f'Unknown message type id {type_id}.')
+        return message_type
+
+    def _discover(self) -> None:
+        pending = list(Dispatchable.__subclasses__())
+        while pending:
+            message_type = pending.pop()
+            pending.extend(message_type.__subclasses__())
+
+            if message_type not in self._ids and dataclasses.is_dataclass(message_type) and not inspect.isabstract(message_type):
+                try:
+                    self.register(message_type)
+                except Exception:
+                    continue
+
+
+class Codec():
+    def __init__(self, registry: typing.Optional[TypeRegistry] = None):
+        self._registry = registry or get_registry()
+        self._schemas: typing.Dict[type, _Schema] = {}
+        self._schemas_by_id: typing.Dict[int, _Schema] = {}
+
+    def encode(self, message: Dispatchable) -> bytes:
+        chunks = []
+        self._schema(type(message)).encode(message, chunks)
+        return b''.join(chunks)
+
+    def encode_many(self, messages: typing.Iterable[Dispatchable]) -> bytes:
+        chunks = []
+        schemas = self._schemas
+        for message in messages:
+            schema = schemas.get(type(message)) or self._schema(type(message))
+            schema.encode(message, chunks)
+        return b''.join(chunks)
+
+    def decode(self, buffer: typing.Union[bytes, bytearray, memoryview], offset: int = 0) -> Dispatchable:
+        return self._decode(memoryview(buffer), offset)[0]
+
+    def decode_many(self, buffer: typing.Union[bytes, bytearray, memoryview]) -> typing.List[Dispatchable]:
+        return list(self.iter_decode(buffer))
+
+    def iter_decode(self, buffer: typing.Union[bytes, bytearray, memoryview]) -> typing.Iterator[Dispatchable]:
+        view = memoryview(buffer)
+        offset = 0
+        while offset < len(view):
+            message, offset = self._decode(view, offset)
+            yield message
+
+    def _decode(self, view: memoryview, offset: int) -> typing.Tuple[Dispatchable, int]:
+        type_id, = _TYPE_ID.unpack_from(view, offset)
+        schema = self._schemas_by_id.get(type_id)
+        if schema is None:
+            schema = self._schema(self._registry.resolve(type_id))
+        return schema.decode(view, offset)
+
+    def _schema(self, message_type: typing.Type[Dispatchable]) -> _Schema:
+        schema = self._schemas.get(message_type)
+        if schema is None:
+            schema = _Schema(message_type, self._registry.type_id(message_type))
+            self._schemas[message_type] = schema
+            self._schemas_by_id[schema.type_id] = schema
+        return schema
+
+
+__registry = None
+
+
+def get_registry() -> TypeRegistry:
+    global __registry
+
+    if __registry is None:
+        __registry = TypeRegistry()
+
+    return __registry
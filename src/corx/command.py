@@ -1,53 +1,85 @@
 import abc
 import dataclasses
-import datetime
 import typing
-import uuid
 
-from corx.dispatcher import Dispatchable, Executor, get_dispatcher
+from corx.dispatcher import Dispatchable, Dispatcher, Execution, Executor, Handle, RetryPolicy, get_dispatcher
 
 __all__ = [
     'Command',
     'CommandType',
+    'CommandHandler',
     'CommandExecutor'
 ]
 
 
 @dataclasses.dataclass
 class Command(Dispatchable, abc.ABC):
-    created_at: float = dataclasses.field(init=False, default_factory=datetime.datetime.now().timestamp)
-    uuid: str = dataclasses.field(init=False, default_factory=lambda: str(uuid.uuid4()))
+    __slots__ = ()
+
+    @property
+    def created_at(self) -> float:
+        return self.timestamp
 
 
 CommandType = typing.TypeVar('CommandType', bound=typing.Type[Command])
+
+
+class CommandHandler(abc.ABC):
+    @abc.abstractmethod
+    def handle(self, command: Command):
+        raise NotImplementedError
+
+
 CommandHandlerType = typing.TypeVar('CommandHandlerType', bound=typing.Callable[[Command], typing.Union[typing.Coroutine, typing.Any]])
 
 
-def handles(command: CommandType):
+def handles(command: CommandType,
+            execution: Execution = Execution.INLINE,
+            dispatcher: typing.Optional[Dispatcher] = None,
+            timeout: typing.Optional[float] = None,
+            retry: typing.Optional[RetryPolicy] = None):
     def wrap(method):
-        get_dispatcher().register(command, method)
+        (dispatcher or get_dispatcher()).register(command, method, execution, timeout, retry)
         return method
 
     return wrap
 
 
 class CommandExecutor(Executor):
-    _registry: typing.Dict[CommandType, CommandHandlerType] = dict()
+    def __init__(self):
+        super().__init__()
+        self._registry: typing.Dict[CommandType, CommandHandlerType] = {}
 
-    def register(self, dispatchable: CommandType, executable: CommandHandlerType):
+    def register(self, dispatchable: CommandType, executable: CommandHandlerType, execution: Execution = Execution.INLINE):
         if dispatchable in self._registry:
             raise Exception(f'{dispatchable} is already registered with {self._registry[dispatchable]}.')
 
         self._registry[dispatchable] = executable
+        self._executions[executable] = execution
 
     def execute(self, dispatchable: Command):
+        handler_method, target = self._handler(dispatchable)
+        self._launch(handler_method, target, dispatchable, dispatchable.ordering_key())
+
+    def submit(self, dispatchable: Command, handle: Handle):
+        try:
+            handler_method, target = self._handler(dispatchable)
+        except Exception as e:
+            handle.set_exception(e)
+            return
+
+        self._launch(handler_method, target, dispatchable, dispatchable.ordering_key(), handle)
+
+    def _handler(self, dispatchable: Command) -> typing.Tuple[CommandHandlerType, typing.Callable]:
         command_class: CommandType = type(dispatchable)
 
         handler_method = self._registry.get(command_class)
         if handler_method is None:
             raise Exception(f'No handler for {command_class.__name__}')
 
-        result = handler_method(dispatchable)
+        if isinstance(handler_method, type) and issubclass(handler_method, CommandHandler):
+            target = handler_method().handle
+        else:
+            target = handler_method
 
-        if isinstance(result, typing.Coroutine):
-            self._loop.push(result)
+        return handler_method, target
@@ -1,87 +1,783 @@
 import abc
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import contextvars
 import dataclasses
+import functools
+import itertools
+import os
+import random
+import threading
+import time
 import typing
+import uuid
 
 __all__ = [
+    'DeadLetter',
+    'DeadLetterQueue',
     'Dispatchable',
+    'Dispatcher',
+    'Execution',
     'Executor',
+    'Handle',
+    'RetryPolicy',
+    'gather',
     'get_dispatcher'
 ]
 
-from corx.loop import get_async_loop
+from corx.loop import AsyncLoop, Backpressure, DeadlineExceeded, Execution, Scheduling, get_async_loop
+from corx.metrics import Metrics
 
 _T = typing.TypeVar('_T')
 _C = typing.TypeVar('_C')
 
+_SEQUENCE_MASK = (1 << 62) - 1
+
+
+def _random_node() -> int:
+    # Random high half plus the RFC 4122 version 4 and variant bits; the sequence fills
+    # the 62 bits left below the variant.
+    return ((random.getrandbits(64) & ~0xF000 | 0x4000) << 64) | (0b10 << 62)
+
+
+_sequence = itertools.count(1)
+_node = _random_node()
+
+
+def _reseed() -> None:
+    global _sequence, _node
+
+    _sequence = itertools.count(1)
+    _node = _random_node()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reseed)
+
+
+_handle_lock = threading.Lock()
+
+
+def _wake(loop: asyncio.AbstractEventLoop, future: asyncio.Future, handle: 'Handle') -> None:
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    if running is loop:
+        _settle(future)
+    else:
+        loop.call_soon_threadsafe(_settle, future)
+
+
+def _settle(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class Handle():
+    __slots__ = ('_loop', '_done', '_result', '_exception', '_callbacks', '_event')
+
+    def __init__(self, loop: AsyncLoop):
+        self._loop = loop
+        self._done = False
+        self._result = None
+        self._exception: typing.Optional[BaseException] = None
+        self._callbacks: typing.Optional[typing.List[typing.Callable[['Handle'], None]]] = None
+        self._event: typing.Optional[threading.Event] = None
+
+    def done(self) -> bool:
+        return self._done
+
+    def result(self, timeout: typing.Optional[float] = None) -> typing.Any:
+        self._wait(timeout)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout: typing.Optional[float] = None) -> typing.Optional[BaseException]:
+        self._wait(timeout)
+        return self._exception
+
+    def add_done_callback(self, callback: typing.Callable[['Handle'], None]) -> None:
+        with _handle_lock:
+            if not self._done:
+                if self._callbacks is None:
+                    self._callbacks = []
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def set_result(self, result: typing.Any) -> None:
+        self._resolve(result, None)
+
+    def set_exception(self, exception: BaseException) -> None:
+        self._resolve(None, exception)
+
+    def chain(self, other: 'Handle') -> None:
+        self._resolve(other._result, other._exception)
+
+    async def follow(self, process: typing.Awaitable) -> None:
+        try:
+            result = await process
+        except Exception as e:
+            self.set_exception(e)
+        else:
+            self.set_result(result)
+
+    def __await__(self) -> typing.Generator[typing.Any, None, typing.Any]:
+        if not self._done:
+            loop = asyncio.get_running_loop()
+            if not self._loop.is_foreign_thread():
+                self._loop.spawn_workers()
+
+            future = loop.create_future()
+            self.add_done_callback(functools.partial(_wake, loop, future))
+            yield from future
+        return self.result()
+
+    def _resolve(self, result: typing.Any, exception: typing.Optional[BaseException]) -> None:
+        with _handle_lock:
+            if self._done:
+                return
+            self._result, self._exception, self._done = result, exception, True
+            callbacks, self._callbacks = self._callbacks, None
+            event = self._event
+
+        if event is not None:
+            event.set()
+        for callback in callbacks or ():
+            callback(self)
+
+    def _wait(self, timeout: typing.Optional[float]) -> None:
+        if self._done:
+            return
+
+        if self._loop.is_foreign_thread():
+            with _handle_lock:
+                if self._event is None:
+                    self._event = threading.Event()
+                event = self._event
+            if not self._done and not event.wait(timeout):
+                raise concurrent.futures.TimeoutError
+            return
+
+        if self._loop.is_running():
+            raise Exception('Await the handle instead of blocking inside the running event loop.')
+
+        self._loop.process()
+        if not self._done:
+            raise Exception('The handle did not complete while processing the loop.')
+
+
+def _forward_failure(handle: Handle, future: concurrent.futures.Future) -> None:
+    exception = future.exception()
+    if exception is not None:
+        handle.set_exception(exception)
+
+
+def gather(*handles: Handle, return_exceptions: bool = False) -> Handle:
+    combined = Handle(handles[0]._loop if handles else get_async_loop())
+    results = [None] * len(handles)
+    remaining = [len(handles)]
+    lock = threading.Lock()
+
+    def collect(index: int, handle: Handle) -> None:
+        if handle._exception is not None and not return_exceptions:
+            combined.set_exception(handle._exception)
+        results[index] = handle._exception if handle._exception is not None else handle._result
+
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            combined.set_result(results)
+
+    if not handles:
+        combined.set_result(results)
+    for index, handle in enumerate(handles):
+        handle.add_done_callback(functools.partial(collect, index))
+
+    return combined
+
+
+class RetryPolicy():
+    __slots__ = ('max_attempts', 'backoff', 'multiplier', 'max_backoff', 'jitter', 'retry_on')
+
+    def __init__(self,
+                 max_attempts: int = 3,
+                 backoff: float = 0.1,
+                 multiplier: float = 2.0,
+                 max_backoff: float = 30.0,
+                 jitter: float = 0.5,
+                 retry_on: typing.Tuple[typing.Type[Exception], ...] = (Exception,)):
+        if max_attempts < 1:
+            raise Exception(f'Invalid number of attempts {max_attempts}.')
+
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.multiplier = multiplier
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_on = retry_on
+
+    def delay(self, attempt: int) -> float:
+        delay = min(self.max_backoff, self.backoff * self.multiplier ** (attempt - 1))
+        return delay - random.uniform(0, delay * self.jitter)
+
+    def should_retry(self, attempt: int, exception: Exception) -> bool:
+        return (attempt < self.max_attempts
+                and isinstance(exception, self.retry_on)
+                and not isinstance(exception, DeadlineExceeded))
+
+
+class _Retry():
+    __slots__ = ('executor', 'policy', 'executable', 'target', 'dispatchable', 'key', 'handle', 'attempts', 'held')
+
+    def __init__(self, executor: 'Executor', policy: RetryPolicy, executable, target: typing.Callable, dispatchable, key, handle: typing.Optional[Handle]):
+        self.executor = executor
+        self.policy = policy
+        self.executable = executable
+        self.target = target
+        self.dispatchable = dispatchable
+        self.key = key
+        self.handle = handle
+        self.attempts = 0
+        self.held = False
+
+    def attempt(self) -> None:
+        self.attempts += 1
+        executor = self.executor
+        try:
+            result = executor._call(self.executable, self.target, self.dispatchable)
+        except Exception as e:
+            self._failed(e, False)
+            return
+
+        if isinstance(result, typing.Coroutine):
+            scheduling = executor._scheduling(self.executable, self.dispatchable, self.fail)
+            process = executor._wrap(self.executable, result, self._follow, scheduling)
+            if self.held:
+                self.held = False
+                executor._loop.resume(process, self.key, scheduling)
+            else:
+                executor._loop.start(process, self.key, scheduling)
+            return
+
+        if self.held:
+            self.held = False
+            executor._loop.release(self.key)
+        if self.handle is not None:
+            self.handle.set_result(result)
+
+    async def _follow(self, process: typing.Coroutine) -> None:
+        try:
+            result = await process
+        except Exception as e:
+            self.fail(e)
+        else:
+            if self.handle is not None:
+                self.handle.set_result(result)
+
+    def fail(self, exception: Exception) -> None:
+        self._failed(exception, self.key is not None)
+
+    def _failed(self, exception: Exception, in_lane: bool) -> None:
+        # Backoff is a loop timer, so no worker is held while waiting for the next attempt.
+        # A keyed attempt keeps its lane reserved meanwhile so later items stay behind it.
+        loop = self.executor._loop
+        if self.policy.should_retry(self.attempts, exception):
+            if in_lane:
+                loop.hold(self.key)
+                self.held = True
+            loop.call_later(self.policy.delay(self.attempts), self.attempt)
+            return
+
+        if self.held:
+            self.held = False
+            loop.release(self.key)
+
+        handle, self.handle = self.handle, None
+        self.executor._dispatcher.dead_letters.append(DeadLetter(self, exception))
+        if handle is None:
+            raise exception
+        handle.set_exception(exception)
+
+
+class DeadLetter():
+    __slots__ = ('dispatchable', 'handler', 'exception', 'attempts', 'timestamp', '_retry')
+
+    def __init__(self, retry: _Retry, exception: Exception):
+        self.dispatchable = retry.dispatchable
+        self.handler = retry.executable
+        self.exception = exception
+        self.attempts = retry.attempts
+        self.timestamp = time.time()
+        self._retry = retry
+
+    def retry(self) -> None:
+        self._retry.attempts = 0
+        self._retry.held = False
+        self._retry.attempt()
+
+    def __repr__(self) -> str:
+        return f'DeadLetter({type(self.dispatchable).__name__}, attempts={self.attempts}, exception={self.exception!r})'
+
+
+class DeadLetterQueue():
+    def __init__(self, max_size: int = 1000):
+        self._letters: typing.Deque[DeadLetter] = collections.deque(maxlen=max_size)
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._letters)
+
+    def __iter__(self) -> typing.Iterator[DeadLetter]:
+        return iter(list(self._letters))
+
+    def append(self, letter: DeadLetter) -> None:
+        if len(self._letters) == self._letters.maxlen:
+            self.dropped += 1
+        self._letters.append(letter)
+
+    def take(self, predicate: typing.Optional[typing.Callable[[DeadLetter], bool]] = None) -> typing.List[DeadLetter]:
+        if predicate is None:
+            letters = list(self._letters)
+            self._letters.clear()
+            return letters
+
+        letters, kept = [], []
+        for letter in self._letters:
+            (letters if predicate(letter) else kept).append(letter)
+        self._letters.clear()
+        self._letters.extend(kept)
+        return letters
+
+    def clear(self) -> None:
+        self._letters.clear()
+
+
+def _name(executable) -> str:
+    return getattr(executable, '__qualname__', type(executable).__qualname__)
+
 
 class Executor():
     def __init__(self):
-        self._loop = get_async_loop()
+        self._dispatcher: typing.Optional['Dispatcher'] = None
+        self._loop: typing.Optional[AsyncLoop] = None
         self._deactivated = set()
+        self._executions = {}
+        self._timeouts = {}
+        self._retries = {}
+
+    def attach(self, dispatcher: 'Dispatcher') -> None:
+        if self._dispatcher is not None and self._dispatcher is not dispatcher:
+            raise Exception(f'{type(self).__name__} is already attached to another dispatcher.')
+
+        self._dispatcher = dispatcher
+        self._loop = dispatcher.loop
 
     @abc.abstractmethod
-    def register(self, dispatchable, executable):
+    def register(self, dispatchable, executable, execution: Execution = Execution.INLINE):
         raise NotImplementedError
 
     @abc.abstractmethod
     def execute(self, dispatchable):
         raise NotImplementedError
 
+    def submit(self, dispatchable, handle: Handle) -> None:
+        try:
+            self.execute(dispatchable)
+        except Exception as e:
+            handle.set_exception(e)
+        else:
+            handle.set_result(None)
+
+    def set_timeout(self, executable, timeout: typing.Optional[float]) -> None:
+        if timeout is None:
+            self._timeouts.pop(executable, None)
+        else:
+            self._timeouts[executable] = timeout
+
+    def set_retry(self, executable, policy: typing.Optional[RetryPolicy]) -> None:
+        if policy is None:
+            self._retries.pop(executable, None)
+        else:
+            self._retries[executable] = policy
+
     def deactivate(self, executable):
         self._deactivated.add(executable)
 
     def activate(self, executable):
-        self._deactivated.remove(executable)
+        self._deactivated.discard(executable)
+
+    def _launch(self, executable, target: typing.Callable, dispatchable, key, handle: typing.Optional[Handle] = None) -> None:
+        policy = self._retries.get(executable)
+        if policy is not None:
+            _Retry(self, policy, executable, target, dispatchable, key, handle).attempt()
+            return
+
+        if handle is None:
+            result = self._call(executable, target, dispatchable)
+            if isinstance(result, typing.Coroutine):
+                scheduling = self._scheduling(executable, dispatchable)
+                self._loop.start(self._wrap(executable, result, None, scheduling), key, scheduling)
+            return
+
+        try:
+            result = self._call(executable, target, dispatchable)
+        except Exception as e:
+            handle.set_exception(e)
+            return
+
+        if isinstance(result, typing.Coroutine):
+            scheduling = self._scheduling(executable, dispatchable, handle.set_exception)
+            self._loop.start(self._wrap(executable, result, handle.follow, scheduling), key, scheduling)
+        else:
+            handle.set_result(result)
+
+    def _call(self, executable, target: typing.Callable, dispatchable):
+        execution = self._executions.get(executable, Execution.INLINE)
+        metrics = self._loop.metrics
+        if metrics is not None:
+            if execution is not Execution.INLINE:
+                target = functools.partial(self._offload, execution, target)
+            return metrics.call(_name(executable), target, dispatchable)
+
+        if execution is Execution.INLINE:
+            return target(dispatchable)
+
+        return self._offload(execution, target, dispatchable)
+
+    def _wrap(self,
+              executable,
+              process: typing.Coroutine,
+              follow: typing.Optional[typing.Callable[[typing.Coroutine], typing.Coroutine]],
+              scheduling: typing.Optional[Scheduling]) -> typing.Coroutine:
+        # Every coroutine that ends up wrapped is listed on the scheduling, so the loop can
+        # close all of them if it drops the outermost one before it starts.
+        metrics = self._loop.metrics
+        if metrics is not None:
+            if scheduling is not None:
+                scheduling.inner.append(process)
+            process = metrics.timed(_name(executable), process, time.perf_counter())
+
+        if follow is not None:
+            if scheduling is not None:
+                scheduling.inner.append(process)
+            process = follow(process)
+
+        return process
+
+    def _scheduling(self, executable, dispatchable, fail: typing.Optional[typing.Callable] = None) -> typing.Optional[Scheduling]:
+        timeout = self._timeouts.get(executable, self._loop.handler_timeout)
+        deadline = dispatchable.deadline()
+        if not dispatchable.priority and deadline is None and timeout is None:
+            return None
+
+        return Scheduling(dispatchable.priority, deadline, timeout, fail)
+
+    async def _offload(self, execution: Execution, target: typing.Callable, dispatchable):
+        result = await self._loop.run_in_pool(execution, target, dispatchable)
+
+        if isinstance(result, typing.Coroutine):
+            result = await result
+
+        if isinstance(result, Dispatchable):
+            self._dispatcher.dispatch(result)
+        elif isinstance(result, (list, tuple)) and result and all(isinstance(item, Dispatchable) for item in result):
+            self._dispatcher.dispatch(*result)
+
+        return result
 
 @dataclasses.dataclass
 class Dispatchable(abc.ABC):
+    __slots__ = ('_id', 'timestamp', '_uuid')
+
+    partition_by: typing.ClassVar[typing.Optional[str]] = None
+    ordered_by: typing.ClassVar[typing.Optional[str]] = None
+    priority: typing.ClassVar[int] = 0
+    time_to_live: typing.ClassVar[typing.Optional[float]] = None
+
+    def __new__(cls, *args, **kwargs):
+        instance = super().__new__(cls)
+        instance._id = _node | next(_sequence)
+        instance.timestamp = time.time()
+        return instance
+
+    @property
+    def sequence(self) -> int:
+        return self._id & _SEQUENCE_MASK
+
+    @property
+    def uuid(self) -> str:
+        try:
+            return self._uuid
+        except AttributeError:
+            self._uuid = str(uuid.UUID(int=self._id))
+            return self._uuid
+
+    def partition_key(self) -> typing.Any:
+        return None if self.partition_by is None else getattr(self, self.partition_by)
+
+    def ordering_key(self) -> typing.Any:
+        return None if self.ordered_by is None else getattr(self, self.ordered_by)
+
+    def deadline(self) -> typing.Optional[float]:
+        return None if self.time_to_live is None else self.timestamp + self.time_to_live
 
     @classmethod
     def dispatch(cls, *args, **kwargs):
         instance = cls.__call__(*args, **kwargs)
-        get_dispatcher().dispatch(instance)
+        return get_dispatcher().dispatch(instance)
+
+    @classmethod
+    async def dispatch_async(cls, *args, **kwargs):
+        instance = cls.__call__(*args, **kwargs)
+        await get_dispatcher().dispatch_async(instance)
+
+    @classmethod
+    def submit(cls, *args, **kwargs) -> Handle:
+        instance = cls.__call__(*args, **kwargs)
+        return get_dispatcher().submit(instance)
+
+
+class Dispatcher():
+    def __init__(self, loop: typing.Optional[AsyncLoop] = None, dead_letters: typing.Optional[DeadLetterQueue] = None) -> None:
+        from corx.command import Command, CommandExecutor
+        from corx.event import Event, EventExecutor
+
+        self._executors: typing.Dict[typing.Type[Dispatchable], Executor] = {}
+        self._routes: typing.Dict[typing.Type[Dispatchable], Executor] = {}
+        self._loop = loop or AsyncLoop()
+        self._dead_letters = DeadLetterQueue() if dead_letters is None else dead_letters
 
+        self.register_executor(Command, CommandExecutor())
+        self.register_executor(Event, EventExecutor())
 
-class __Dispatcher():
-    def __init__(self) -> None:
-        self._executors = {}
-        self._loop = get_async_loop()
+        # Handlers on the loop's workers resolve to the first dispatcher built on that loop.
+        if _active not in self._loop.context:
+            self._loop.context.run(_active.set, self)
 
-    def dispatch(self, *dispatchables: _T) -> None:
+    @property
+    def loop(self) -> AsyncLoop:
+        return self._loop
+
+    @property
+    def dead_letters(self) -> DeadLetterQueue:
+        return self._dead_letters
+
+    def dispatch(self, *dispatchables: _T) -> typing.Optional[concurrent.futures.Future]:
+        if self._loop.is_foreign_thread():
+            return self._loop.submit(self._ingest, dispatchables)
+
+        self._loop.bind()
+        self._execute(dispatchables)
+        self._loop.process()
+
+    async def dispatch_async(self, *dispatchables: _T) -> None:
+        if self._loop.is_foreign_thread():
+            await asyncio.wrap_future(self._loop.submit(self._ingest, dispatchables))
+            return
+
+        self._loop.bind(asyncio.get_running_loop())
+        await self._ingest(dispatchables)
+        await self._loop.join()
+
+    def dispatch_nowait(self, *dispatchables: _T) -> typing.Optional[concurrent.futures.Future]:
+        if self._loop.is_foreign_thread():
+            return self._loop.submit(self._ingest, dispatchables)
+
+        self._loop.bind(asyncio.get_running_loop())
+        loop = self._loop
         for dispatchable in dispatchables:
-            executor = self._resolve(type(dispatchable))
-            executor.execute(dispatchable)
+            loop.admit_nowait()
+            self._execute((dispatchable,))
+
+    def submit(self, dispatchable: _T) -> Handle:
+        handle = Handle(self._loop)
+        if self._loop.is_foreign_thread():
+            future = self._loop.submit(self._ingest_handle, dispatchable, handle)
+            future.add_done_callback(functools.partial(_forward_failure, handle))
+            return handle
+
+        self._loop.bind()
+        if self._loop.is_running():
+            self._loop.admit_nowait()
+        self._submit(dispatchable, handle)
+        return handle
+
+    def gather(self, *dispatchables: _T, return_exceptions: bool = False) -> Handle:
+        return gather(*[self.submit(dispatchable) for dispatchable in dispatchables], return_exceptions=return_exceptions)
+
+    async def _ingest(self, dispatchables: typing.Iterable[_T]) -> None:
+        # Items are admitted one at a time, so a batch cannot carry the queue past its bound.
+        loop = self._loop
+        for dispatchable in dispatchables:
+            await loop.admit()
+            self._execute((dispatchable,))
+
+    async def _ingest_handle(self, dispatchable: _T, handle: Handle) -> None:
+        await self._loop.admit()
+        self._submit(dispatchable, handle)
+
+    async def _ingest_replay(self, predicate: typing.Optional[typing.Callable[[DeadLetter], bool]]) -> int:
+        return self._replay(predicate)
+
+    @contextlib.contextmanager
+    def _activated(self) -> typing.Iterator[None]:
+        # Inline handlers dispatch to the bus that is running them.
+        token = _active.set(self)
+        try:
+            yield
+        finally:
+            _active.reset(token)
+
+    def _replay(self, predicate: typing.Optional[typing.Callable[[DeadLetter], bool]]) -> int:
+        letters = self._dead_letters.take(predicate)
+        with self._activated():
+            for letter in letters:
+                try:
+                    letter.retry()
+                except Exception:
+                    continue  # the failure is dead-lettered again
+        return len(letters)
+
+    def _submit(self, dispatchable: _T, handle: Handle) -> None:
+        dispatchable_class = type(dispatchable)
+        if self._loop.metrics is not None:
+            self._loop.metrics.count_dispatch(dispatchable_class)
+
+        try:
+            executor = self._routes.get(dispatchable_class) or self._resolve(dispatchable_class)
+        except Exception as e:
+            handle.set_exception(e)
+        else:
+            with self._activated():
+                executor.submit(dispatchable, handle)
+
+    def _execute(self, dispatchables: typing.Iterable[_T]) -> None:
+        routes = self._routes
+        metrics = self._loop.metrics
+        with self._activated():
+            for dispatchable in dispatchables:
+                if metrics is not None:
+                    metrics.count_dispatch(type(dispatchable))
+                dispatchable_class = type(dispatchable)
+                executor = routes.get(dispatchable_class) or self._resolve(dispatchable_class)
+                executor.execute(dispatchable)
+
+    def replay_dead_letters(self, predicate: typing.Optional[typing.Callable[[DeadLetter], bool]] = None) -> int:
+        if self._loop.is_foreign_thread():
+            return self._loop.submit(self._ingest_replay, predicate).result()
+
+        self._loop.bind()
+        replayed = self._replay(predicate)
         self._loop.process()
+        return replayed
 
     def propagate_exceptions(self, status: bool):
         self._loop.propagate_exceptions(status)
 
+    def drain_exceptions(self) -> typing.List[Exception]:
+        return self._loop.drain_exceptions()
+
+    def configure_loop(self,
+                       min_workers: int = 1,
+                       max_workers: int = 64,
+                       max_queue_size: int = 0,
+                       backpressure: Backpressure = Backpressure.BLOCK,
+                       idle_timeout: float = 5.0,
+                       handler_timeout: typing.Optional[float] = None,
+                       max_exceptions: int = 1000) -> None:
+        self._loop.configure(min_workers, max_workers, max_queue_size, backpressure, idle_timeout, handler_timeout, max_exceptions)
+
+    def start_thread(self) -> None:
+        self._loop.start_thread()
+
+    def stop_thread(self, timeout: typing.Optional[float] = None) -> None:
+        self._loop.stop_thread(timeout)
+
+    def use_pool(self, execution: Execution, pool) -> None:
+        self._loop.use_pool(execution, pool)
+
+    def enable_metrics(self, metrics: typing.Optional[Metrics] = None) -> Metrics:
+        metrics = metrics or Metrics()
+        self._loop.use_metrics(metrics)
+        return metrics
+
+    def disable_metrics(self) -> None:
+        self._loop.use_metrics(None)
+
     def register_executor(self, dispatchable: typing.Type[Dispatchable], executor: Executor):
+        executor.attach(self)
         self._executors[dispatchable] = executor
+        self._routes.clear()
 
-    def _resolve(self, instance: typing.Type[Dispatchable]) -> Executor:
-        return self._executors[instance.__bases__[0]]
+    def _resolve(self, dispatchable: typing.Type[Dispatchable]) -> Executor:
+        executor = self._routes.get(dispatchable)
+        if executor is None:
+            executor = self._routes[dispatchable] = self._route(dispatchable)
+        return executor
 
-    def register(self, dispatchable: typing.Type[Dispatchable], executable: typing.Type[_C]) -> None:
+    def _route(self, dispatchable: typing.Type[Dispatchable]) -> Executor:
+        for base in dispatchable.__mro__:
+            executor = self._executors.get(base)
+            if executor is not None:
+                return executor
+
+        raise Exception(f'No executor for {dispatchable.__name__}')
+
+    def register(self,
+                 dispatchable: typing.Type[Dispatchable],
+                 executable: typing.Type[_C],
+                 execution: Execution = Execution.INLINE,
+                 timeout: typing.Optional[float] = None,
+                 retry: typing.Optional[RetryPolicy] = None) -> None:
         executor = self._resolve(dispatchable)
-        executor.register(dispatchable, executable)
+        executor.register(dispatchable, executable, execution)
+        if timeout is not None:
+            executor.set_timeout(executable, timeout)
+        if retry is not None:
+            executor.set_retry(executable, retry)
 
     def deactivate(self, executable: typing.Any) -> None:
-        self._resolve(executable).deactivate(executable)
+        for executor in set(self._executors.values()):
+            executor.deactivate(executable)
 
     def activate(self, executable: typing.Any) -> None:
-        self._resolve(executable).activate(executable)
+        for executor in set(self._executors.values()):
+            executor.activate(executable)
 
 __dispatcher = None
+_active: 'contextvars.ContextVar[typing.Optional[Dispatcher]]' = contextvars.ContextVar('corx_dispatcher', default=None)
 
-def get_dispatcher() -> __Dispatcher:
+def get_dispatcher() -> Dispatcher:
     global __dispatcher
 
+    active = _active.get()
+    if active is not None:
+        return active
+
     if __dispatcher is None:
-        __dispatcher = __Dispatcher()
+        __dispatcher = Dispatcher(get_async_loop())
 
     return __dispatcher
 
 
 def dispatch( *dispatchables: _T):
     return get_dispatcher().dispatch(*dispatchables)
+
+
+async def dispatch_async(*dispatchables: _T):
+    return await get_dispatcher().dispatch_async(*dispatchables)
+
+
+def dispatch_nowait(*dispatchables: _T):
+    return get_dispatcher().dispatch_nowait(*dispatchables)
+
+
+def submit(dispatchable: _T) -> Handle:
+    return get_dispatcher().submit(dispatchable)
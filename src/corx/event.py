@@ -1,34 +1,40 @@
 import abc
+import copy
 import dataclasses
-import datetime
+import functools
 import typing
-import uuid
 
-from corx.dispatcher import Dispatchable, get_dispatcher, Executor
+from corx.dispatcher import Dispatchable, Dispatcher, get_dispatcher, Execution, Executor, Handle, RetryPolicy, gather
+from corx.loop import AsyncLoop
 
 __all__ = [
     'Event',
     'EventType',
     'EventListener',
     'EventExecutor',
+    'EventStore',
     'RuntimeEventStore',
     'ProcessManager',
     'AnyEvent',
+    'BatchListener',
+    'ConcurrencyError',
 ]
 
 _T = typing.TypeVar('_T')
 
 @dataclasses.dataclass
 class Event(typing.Generic[_T], Dispatchable, abc.ABC):
-    _versions = {}
+    __slots__ = ('version', 'expected_version')
 
-    timestamp: float = dataclasses.field(init=False, default_factory=datetime.datetime.now().timestamp)
-    uuid: str = dataclasses.field(init=False, default_factory=lambda: str(uuid.uuid4()))
-    version: int = dataclasses.field(init=False)
+    def __new__(cls, *args, **kwargs):
+        instance = super().__new__(cls, *args, **kwargs)
+        instance.version = 0
+        instance.expected_version = None
+        return instance
 
-    def __post_init__(self):
-        self.version = self._versions.setdefault(type(self), 0) + 1
-        self._versions[type(self)] = self.version
+    def expect(self, version: int) -> 'Event[_T]':
+        self.expected_version = version
+        return self
 
     @abc.abstractmethod
     def apply(self, aggregate: _T):
@@ -38,6 +44,20 @@ class Event(typing.Generic[_T], Dispatchable, abc.ABC):
 EventType = typing.TypeVar('EventType', bound=typing.Type[Event])
 
 
+class ConcurrencyError(Exception):
+    def __init__(self, stream: typing.Any, version: int, expected_version: int):
+        super().__init__(f'Stream {stream!r} is at version {version}, expected {expected_version}.')
+        self.stream = stream
+        self.version = version
+        self.expected_version = expected_version
+
+
+def check_version(stream: typing.Any, version: int, expected_version: typing.Optional[int]) -> int:
+    if expected_version is not None and expected_version != version:
+        raise ConcurrencyError(stream, version, expected_version)
+    return version + 1
+
+
 class AnyEvent(Event, abc.ABC):
     ...
 
@@ -48,13 +68,64 @@ class EventListener():
         raise NotImplementedError
 
 
+class BatchListener(abc.ABC):
+    max_batch_size: typing.ClassVar[int] = 100
+    max_linger: typing.ClassVar[float] = 0.05
+
+    @abc.abstractmethod
+    def react_batch(self, events: typing.List[Event]):
+        raise NotImplementedError
+
+
+class _Batch(list):
+    # A flushed batch is launched like a single event, so it carries the scheduling
+    # attributes the executor reads; it is never dropped for age.
+    __slots__ = ('priority',)
+
+    def __init__(self, events: typing.List[Event]):
+        super().__init__(events)
+        self.priority = max(event.priority for event in events)
+
+    def deadline(self) -> typing.Optional[float]:
+        return None
+
+
+class _Batcher():
+    __slots__ = ('loop', 'launch', 'max_batch_size', 'max_linger', 'events')
+
+    def __init__(self, loop: typing.Any, launch: typing.Callable, instance: BatchListener):
+        self.loop = loop
+        self.launch = launch
+        self.max_batch_size = instance.max_batch_size
+        self.max_linger = instance.max_linger
+        self.events: typing.List[Event] = []
+
+    def add(self, event: Event):
+        events = self.events
+        events.append(event)
+        if len(events) >= self.max_batch_size:
+            self.flush()
+        elif len(events) == 1:
+            self.loop.schedule_flush(self.flush, self.max_linger)
+
+    def flush(self):
+        self.loop.cancel_flush(self.flush)
+        events, self.events = self.events, []
+        if events:
+            self.launch(_Batch(events), None)
+
+
 EventListenerType = typing.TypeVar('EventListenerType', bound=typing.Callable[[Event], typing.Union[typing.Coroutine, typing.Any]])
 
 
-def reacts(*events: EventType):
+def reacts(*events: EventType,
+           execution: Execution = Execution.INLINE,
+           dispatcher: typing.Optional[Dispatcher] = None,
+           timeout: typing.Optional[float] = None,
+           retry: typing.Optional[RetryPolicy] = None):
     def wrap(cls):
         for react in events:
-            get_dispatcher().register(react, cls)
+            (dispatcher or get_dispatcher()).register(react, cls, execution, timeout, retry)
         return cls
 
     return wrap
@@ -64,44 +135,226 @@ class ProcessManager(EventListener, abc.ABC):
     ...
 
 
-class RuntimeEventStore(EventListener):
-    def __init__(self):
-        super().__init__()
-        self._store: typing.Dict[str, Event] = {}
+def assign_version(event: Event, version: int) -> int:
+    # The first store to number a dispatched event hands its version on to the listeners
+    # that run after it.
+    if not event.version:
+        event.version = version
+    return version
+
+
+def _stamped(event: Event, version: int) -> Event:
+    # Stores keep their own copy so that several stores fed by the same dispatch
+    # can number the event independently.
+    assign_version(event, version)
+    stored = copy.copy(event)
+    stored.version = version
+    return stored
 
+
+class EventStore(EventListener, abc.ABC):
     async def react(self, event: Event):
-        self._store[event.uuid] = event
+        self.append(event)
+
+    def bind(self, loop: AsyncLoop) -> None:
+        ...
+
+    @abc.abstractmethod
+    def append(self, event: Event, expected_version: typing.Optional[int] = None) -> typing.Any:
+        raise NotImplementedError
+
+
+class RuntimeEventStore(EventStore):
+    def __init__(self):
+        super().__init__()
+        self._log: typing.List[Event] = []
+        self._positions: typing.Dict[int, int] = {}
+        self._by_type: typing.Dict[EventType, typing.List[Event]] = {}
+        self._by_aggregate: typing.Dict[typing.Any, typing.List[Event]] = {}
+        self._latest_by_type: typing.Dict[EventType, Event] = {}
 
     def clear(self):
-        self._store.clear()
+        self._log.clear()
+        self._positions.clear()
+        self._by_type.clear()
+        self._by_aggregate.clear()
+        self._latest_by_type.clear()
 
     def seed_events(self, *events: Event):
         for event in events:
-            self._store[event.uuid] = event
+            self.append(event)
 
     def get(self) -> typing.List[Event]:
-        return sorted(self._store.values(), key=lambda event: event.timestamp)
+        return self._log.copy()
+
+    def replay(self, start: int = 0) -> typing.Iterator[Event]:
+        log = self._log
+        for position in range(start, len(log)):
+            yield log[position]
+
+    def get_by_type(self, event_type: EventType) -> typing.List[Event]:
+        return self._by_type.get(event_type, []).copy()
+
+    def get_by_aggregate(self, aggregate_id: typing.Any, start: int = 0) -> typing.List[Event]:
+        return self._by_aggregate.get(aggregate_id, [])[start:]
 
     def get_latest_by_type(self, event_type: EventType) -> Event:
-        events = list(self._store.values()).copy()
-        events = filter(lambda event: type(event) is event_type, events)
-        return sorted(events, key=lambda event: event.version)[-1]
+        latest = self._latest_by_type.get(event_type)
+        if latest is None:
+            raise Exception(f'No {event_type.__name__} events stored.')
+        return latest
+
+    def get_version(self, aggregate_id: typing.Any) -> int:
+        return len(self._by_aggregate.get(aggregate_id, ()))
+
+    def __len__(self) -> int:
+        return len(self._log)
+
+    def append(self, event: Event, expected_version: typing.Optional[int] = None) -> None:
+        position = self._positions.get(event._id)
+        if position is not None:
+            self._replace(position, event)
+            return
+
+        event_type = type(event)
+        aggregate_id = getattr(event, 'aggregate_id', None)
+        if aggregate_id is None:
+            stream, stream_events = event_type, self._by_type.get(event_type, ())
+        else:
+            stream, stream_events = aggregate_id, self._by_aggregate.get(aggregate_id, ())
+
+        if expected_version is None:
+            expected_version = event.expected_version
+        event = _stamped(event, check_version(stream, len(stream_events), expected_version))
+
+        self._positions[event._id] = len(self._log)
+        self._log.append(event)
+        self._by_type.setdefault(event_type, []).append(event)
+        if aggregate_id is not None:
+            self._by_aggregate.setdefault(aggregate_id, []).append(event)
+        self._latest_by_type[event_type] = event
+
+    def _replace(self, position: int, event: Event):
+        previous = self._log[position]
+        event = self._log[position] = _stamped(event, previous.version)
+
+        indexed_events = [self._by_type[type(previous)]]
+        aggregate_id = getattr(previous, 'aggregate_id', None)
+        if aggregate_id is not None:
+            indexed_events.append(self._by_aggregate[aggregate_id])
+
+        for events in indexed_events:
+            for index, indexed in enumerate(events):
+                if indexed is previous:
+                    events[index] = event
+                    break
+
+        if self._latest_by_type[type(previous)] is previous:
+            self._latest_by_type[type(previous)] = event
 
 
 class EventExecutor(Executor):
-    _registry: typing.Dict[EventType, typing.List[EventListenerType]] = dict()
+    def __init__(self):
+        super().__init__()
+        self._registry: typing.Dict[EventType, typing.List[EventListenerType]] = {}
+        self._plans: typing.Dict[EventType, typing.Tuple[typing.Tuple[EventListenerType, typing.Callable, int, bool], ...]] = {}
+        self._instances: typing.Dict[type, typing.Any] = {}
+        self._batchers: typing.Dict[typing.Any, _Batcher] = {}
 
-    def register(self, dispatchable: EventType, executable: EventListenerType):
+    def register(self, dispatchable: EventType, executable: EventListenerType, execution: Execution = Execution.INLINE):
         self._registry.setdefault(dispatchable, []).append(executable)
+        self._executions[executable] = execution
+        self._plans.clear()
+        if isinstance(executable, EventStore):
+            executable.bind(self._loop)
 
-    def execute(self, dispatchable: Event):
-        event_class = type(dispatchable)
+    def deactivate(self, executable):
+        super().deactivate(executable)
+        self._plans.clear()
 
-        all_listeners: typing.List[EventListenerType] = (
-                self._registry.get(event_class, [])
-                + self._registry.get(AnyEvent, []))
+    def activate(self, executable):
+        super().activate(executable)
+        self._plans.clear()
 
-        for listener in all_listeners:
-            if listener not in self._deactivated:
-                process = listener(dispatchable)
-                self._loop.push(process)
+    def execute(self, dispatchable: Event):
+        key = dispatchable.ordering_key()
+        for listener, target, _, _ in self._fan_out(type(dispatchable)):
+            self._launch(listener, target, dispatchable, None if key is None else (listener, key))
+
+    def submit(self, dispatchable: Event, handle: Handle):
+        key = dispatchable.ordering_key()
+        plan = self._fan_out(type(dispatchable))
+        reactions = [Handle(self._loop) for _ in plan]
+        for listener, target, slot, appends in plan:
+            reaction = reactions[slot]
+            self._launch(listener, target, dispatchable, None if key is None else (listener, key), reaction)
+            if appends and reaction.done() and reaction.exception() is not None:
+                handle.chain(reaction)
+                return
+
+        gather(*reactions).add_done_callback(handle.chain)
+
+    def _launch(self, executable, target: typing.Callable, dispatchable, key, handle: typing.Optional[Handle] = None) -> None:
+        # Adding to a batch only buffers the event; the batch itself is launched on flush.
+        if type(executable) is not _Batcher:
+            super()._launch(executable, target, dispatchable, key, handle)
+            return
+
+        try:
+            target(dispatchable)
+        except Exception as e:
+            if handle is None:
+                raise
+            handle.set_exception(e)
+        else:
+            if handle is not None:
+                handle.set_result(None)
+
+    def _fan_out(self, event_class: EventType) -> typing.Tuple[typing.Tuple[EventListenerType, typing.Callable, int, bool], ...]:
+        plan = self._plans.get(event_class)
+        if plan is None:
+            plan = self._plans[event_class] = self._plan(event_class)
+        return plan
+
+    def _plan(self, event_class: EventType) -> typing.Tuple[typing.Tuple[EventListenerType, typing.Callable, int, bool], ...]:
+        listeners: typing.Dict[EventListenerType, None] = {}
+        for base in (*event_class.__mro__, AnyEvent):
+            for listener in self._registry.get(base, ()):
+                if listener not in self._deactivated:
+                    listeners.setdefault(listener)
+
+        # Stores append first, so the other listeners see the version they assign and an
+        # append rejected by a store is not fanned out any further. Reactions keep their
+        # place in registration order.
+        entries = []
+        for slot, listener in enumerate(listeners):
+            executable, target, appends = self._entry(listener)
+            entries.append((executable, target, slot, appends))
+        entries.sort(key=lambda entry: not entry[3])
+        return tuple(entries)
+
+    def _entry(self, listener: EventListenerType) -> typing.Tuple[typing.Any, typing.Callable, bool]:
+        if isinstance(listener, type) and issubclass(listener, (EventListener, BatchListener)):
+            instance = self._instances.get(listener)
+            if instance is None:
+                instance = self._instances[listener] = listener()
+                if isinstance(instance, EventStore):
+                    instance.bind(self._loop)
+        else:
+            instance = listener
+
+        if isinstance(instance, BatchListener):
+            batcher = self._batchers.get(listener)
+            if batcher is None:
+                # Batches run under the listener's own retry, timeout and metrics name.
+                launch = functools.partial(self._launch, listener, instance.react_batch)
+                batcher = self._batchers[listener] = _Batcher(self._loop, launch, instance)
+            return batcher, batcher.add, False
+
+        if isinstance(instance, EventStore):
+            return listener, instance.append, True
+
+        if isinstance(instance, EventListener):
+            return listener, instance.react, False
+
+        return listener, listener, False
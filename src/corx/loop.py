@@ -1,67 +1,683 @@
 import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import enum
+import functools
+import sys
+import threading
+import time
 import typing
 
+_EAGER_DEPTH = 32
+# Eager start needs Task(eager_start=True); older Pythons queue every coroutine, and only
+# synchronous listeners skip the queue there.
+_EAGER_TASKS = sys.version_info >= (3, 12)
+
+
+class Backpressure(enum.Enum):
+    BLOCK = 'block'
+    REJECT = 'reject'
+
+
+class Execution(enum.Enum):
+    INLINE = 'inline'
+    THREAD = 'thread'
+    PROCESS = 'process'
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, deadline: float):
+        super().__init__(f'Deadline {deadline} passed before the handler started.')
+        self.deadline = deadline
+
+
+class HandlerTimeout(Exception):
+    def __init__(self, timeout: float):
+        super().__init__(f'Handler exceeded its timeout of {timeout}s.')
+        self.timeout = timeout
+
+
+class Scheduling():
+    __slots__ = ('priority', 'deadline', 'timeout', 'fail', 'inner')
+
+    def __init__(self,
+                 priority: int = 0,
+                 deadline: typing.Optional[float] = None,
+                 timeout: typing.Optional[float] = None,
+                 fail: typing.Optional[typing.Callable[[Exception], None]] = None):
+        self.priority = priority
+        self.deadline = deadline
+        self.timeout = timeout
+        self.fail = fail
+        self.inner: typing.List[typing.Coroutine] = []
+
+
+class _PriorityLanes():
+    __slots__ = ('_lanes', '_levels', '_size')
 
-class __AsyncLoop():
     def __init__(self):
-        self._loop = asyncio.get_event_loop()
-        self._queue = asyncio.Queue()
-        self._worker_tasks = []
+        self._lanes: typing.Dict[int, typing.Deque[tuple]] = {0: collections.deque()}
+        self._levels = [0]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, item: tuple) -> None:
+        scheduling = item[2]
+        priority = 0 if scheduling is None else scheduling.priority
+        lane = self._lanes.get(priority)
+        if lane is None:
+            lane = self._lanes[priority] = collections.deque()
+            self._levels = sorted(self._lanes, reverse=True)
+        lane.append(item)
+        self._size += 1
+
+    def popleft(self) -> tuple:
+        for level in self._levels:
+            lane = self._lanes[level]
+            if lane:
+                self._size -= 1
+                return lane.popleft()
+        raise IndexError('pop from empty lanes')
+
+
+class _PriorityQueue(asyncio.Queue):
+    def _init(self, maxsize: int) -> None:
+        self._queue = _PriorityLanes()
+
+    def _put(self, item: tuple) -> None:
+        self._queue.append(item)
+
+    def _get(self) -> tuple:
+        return self._queue.popleft()
+
+
+def _cancel_timed_out(task: asyncio.Task, fired: typing.List[bool]) -> None:
+    fired.append(True)
+    task.cancel()
+
+
+def _thread_event_loop() -> asyncio.AbstractEventLoop:
+    try:
+        return asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        return loop
+
+
+class AsyncLoop():
+    def __init__(self):
+        self._default_loop = _thread_event_loop()
+        self._loop = self._default_loop
+        self._queue = _PriorityQueue()
+        self._worker_tasks: typing.Set[asyncio.Task] = set()
+        self._eager_tasks: typing.Set[asyncio.Task] = set()
+        self._capacity_waiters = []
+        self._lanes: typing.Dict[typing.Hashable, typing.Deque[typing.Tuple[typing.Coroutine, typing.Optional[Scheduling]]]] = {}
+        self._holds: typing.Set[typing.Hashable] = set()
+        self._deferred = 0
+        self._pending = 0
+        self._eager_depth = 0
         self._processing = False
         self._exception_propagating = False
-        self._exceptions = []
+        self._exceptions: typing.Deque[Exception] = collections.deque()
+        self._exceptions_dropped = 0
+        self._delayed = 0
+        self._delay_waiters: typing.List[asyncio.Future] = []
+        self._pools: typing.Dict[Execution, concurrent.futures.Executor] = {}
+        self._metrics = None
+        self._thread: typing.Optional[threading.Thread] = None
+        self._flushers: typing.Dict[typing.Callable[[], typing.Any], typing.Optional[asyncio.TimerHandle]] = {}
+        self._context = contextvars.copy_context()
+        self.configure()
+
+    def configure(self,
+                  min_workers: int = 1,
+                  max_workers: int = 64,
+                  max_queue_size: int = 0,
+                  backpressure: Backpressure = Backpressure.BLOCK,
+                  idle_timeout: float = 5.0,
+                  handler_timeout: typing.Optional[float] = None,
+                  max_exceptions: int = 1000) -> None:
+        if min_workers < 0 or max_workers < max(min_workers, 1):
+            raise Exception(f'Invalid worker bounds {min_workers}..{max_workers}.')
+
+        self._min_workers = min_workers
+        self._max_workers = max_workers
+        self._max_queue_size = max_queue_size
+        self._backpressure = backpressure
+        self._idle_timeout = idle_timeout
+        self._handler_timeout = handler_timeout
+        self._exceptions = collections.deque(self._exceptions, maxlen=max_exceptions)
+
+    def bind(self, loop: typing.Optional[asyncio.AbstractEventLoop] = None) -> None:
+        if loop is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = self._default_loop
+
+        if loop is self._loop:
+            return
+
+        if self._pending or self._delayed:
+            raise Exception('Cannot switch event loops while processes are still pending.')
+
+        if not self._loop.is_closed():
+            for worker_task in self._worker_tasks:
+                worker_task.cancel()
+
+        self._loop = loop
+        self._queue = _PriorityQueue()
+        self._worker_tasks = set()
+        self._capacity_waiters = []
+        self._delay_waiters = []
+        self._lanes = {}
+        self._holds = set()
+        self._deferred = 0
+
+        for flush, timer in self._flushers.items():
+            if timer is not None:
+                timer.cancel()
+                self._flushers[flush] = None
+
+    def is_running(self) -> bool:
+        return self._loop.is_running()
+
+    @property
+    def context(self) -> contextvars.Context:
+        # Worker tasks start from a copy of this context rather than from whichever caller
+        # happened to spawn them.
+        return self._context
+
+    def is_foreign_thread(self) -> bool:
+        if not self._loop.is_running():
+            return False
+
+        try:
+            return asyncio.get_running_loop() is not self._loop
+        except RuntimeError:
+            return True
+
+    def submit(self, function: typing.Callable[..., typing.Coroutine], *args) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(function(*args), self._loop)
+
+    def start_thread(self, name: str = 'corx-loop') -> None:
+        if self._thread is not None:
+            raise Exception('The loop thread is already running.')
+
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            self.bind(loop)
+            loop.call_soon(started.set)
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name=name, daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def stop_thread(self, timeout: typing.Optional[float] = None) -> None:
+        thread, loop = self._thread, self._loop
+        if thread is None:
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            loop.close()
+            self._thread = None
+
+    async def _shutdown(self) -> None:
+        self.spawn_workers()
+        await self._drain()
+
+        worker_tasks = list(self._worker_tasks)
+        for worker_task in worker_tasks:
+            worker_task.cancel()
+        await asyncio.gather(*worker_tasks, return_exceptions=True)
+
+    @property
+    def handler_timeout(self) -> typing.Optional[float]:
+        return self._handler_timeout
+
+    @property
+    def metrics(self):
+        return self._metrics
+
+    def use_metrics(self, metrics) -> None:
+        if metrics is not None:
+            metrics.bind(self)
+        self._metrics = metrics
+
+    def stats(self) -> typing.Dict[str, int]:
+        backlog = self._queue.qsize() + self._deferred
+        return {
+            'queue_depth': backlog,
+            'pending': self._pending,
+            'workers': len(self._worker_tasks),
+            'workers_active': self._pending - backlog - len(self._eager_tasks),
+            'eager_tasks': len(self._eager_tasks),
+            'exceptions': len(self._exceptions),
+            'exceptions_dropped': self._exceptions_dropped,
+            'delayed': self._delayed,
+        }
+
+    def use_pool(self, execution: Execution, pool: concurrent.futures.Executor) -> None:
+        if execution is Execution.INLINE:
+            raise Exception('Inline execution does not use a pool.')
+
+        previous = self._pools.get(execution)
+        self._pools[execution] = pool
+        if previous is not None and previous is not pool:
+            previous.shutdown(wait=False)
+
+    def run_in_pool(self, execution: Execution, function: typing.Callable, *args) -> asyncio.Future:
+        if execution is Execution.THREAD:
+            function = functools.partial(contextvars.copy_context().run, function)
+        return self._loop.run_in_executor(self._pool(execution), function, *args)
+
+    def _pool(self, execution: Execution) -> concurrent.futures.Executor:
+        pool = self._pools.get(execution)
+        if pool is None:
+            if execution is Execution.THREAD:
+                pool = concurrent.futures.ThreadPoolExecutor(thread_name_prefix='corx')
+            elif execution is Execution.PROCESS:
+                pool = concurrent.futures.ProcessPoolExecutor()
+            else:
+                raise Exception('Inline execution does not use a pool.')
+            self._pools[execution] = pool
+        return pool
+
+    def push(self,
+             process: typing.Coroutine,
+             key: typing.Optional[typing.Hashable] = None,
+             scheduling: typing.Optional[Scheduling] = None) -> None:
+        if self._is_full() and not self._loop.is_running():
+            if self._backpressure is Backpressure.REJECT:
+                process.close()
+                raise asyncio.QueueFull
 
-    def push(self, process: typing.Coroutine) -> None:
-        self._queue.put_nowait(process)
+            self.spawn_workers()
+            self._loop.run_until_complete(self._capacity())
+
+        self._pending += 1
+        if key is not None:
+            lane = self._lanes.get(key)
+            if lane is not None:
+                lane.append((process, scheduling))
+                self._deferred += 1
+                return
+            self._lanes[key] = collections.deque()
+
+        self._queue.put_nowait((process, key, scheduling))
         self._manage_workers()
 
+    def start(self,
+              process: typing.Coroutine,
+              key: typing.Optional[typing.Hashable] = None,
+              scheduling: typing.Optional[Scheduling] = None) -> None:
+        if (not _EAGER_TASKS
+                or key is not None
+                or (scheduling is not None and scheduling.timeout is not None)
+                or self._eager_depth >= _EAGER_DEPTH
+                or len(self._eager_tasks) >= self._max_workers
+                or not self._loop.is_running()
+                or not self._in_loop_task()):
+            self.push(process, key, scheduling)
+            return
+
+        if scheduling is not None and scheduling.deadline is not None and time.time() > scheduling.deadline:
+            self._drop(process, scheduling)
+            return
+
+        # An eager task runs its first step right here but under its own task identity,
+        # so timeouts and cancellation scopes inside the handler stay its own.
+        self._pending += 1
+        self._eager_depth += 1
+        try:
+            task = asyncio.Task(process, loop=self._loop, eager_start=True)
+        finally:
+            self._eager_depth -= 1
+
+        if task.done():
+            self._finish_eager(task)
+        else:
+            self._eager_tasks.add(task)
+            task.add_done_callback(self._finish_eager)
+
+    def _in_loop_task(self) -> bool:
+        if self._eager_depth:
+            return True
+
+        task = asyncio.current_task()
+        return task in self._worker_tasks or task in self._eager_tasks
+
+    def _finish_eager(self, task: asyncio.Task) -> None:
+        self._eager_tasks.discard(task)
+        self._pending -= 1
+        if not task.cancelled():
+            exception = task.exception()
+            if isinstance(exception, Exception):
+                self._record(exception)
+
+    def schedule_flush(self, flush: typing.Callable[[], typing.Any], delay: float) -> None:
+        if flush not in self._flushers:
+            self._flushers[flush] = self._loop.call_later(delay, self._expire_flush, flush)
+
+    def cancel_flush(self, flush: typing.Callable[[], typing.Any]) -> None:
+        timer = self._flushers.pop(flush, None)
+        if timer is not None:
+            timer.cancel()
+
+    def flush(self) -> None:
+        while self._flushers:
+            for flush in list(self._flushers):
+                self.cancel_flush(flush)
+                self._run_callback(flush)
+
+    def call_later(self, delay: float, callback: typing.Callable[[], typing.Any]) -> None:
+        self._delayed += 1
+        self._loop.call_later(delay, self._expire_delayed, callback)
+
+    def _expire_flush(self, flush: typing.Callable[[], typing.Any]) -> None:
+        self._flushers.pop(flush, None)
+        self._run_callback(flush)
+
+    def _expire_delayed(self, callback: typing.Callable[[], typing.Any]) -> None:
+        self._delayed -= 1
+        self._run_callback(callback)
+
+        waiters, self._delay_waiters = self._delay_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _run_callback(self, callback: typing.Callable[[], typing.Any]) -> None:
+        try:
+            result = callback()
+        except Exception as e:
+            self._record(e)
+            return
+
+        if isinstance(result, typing.Coroutine):
+            self.push(result)
+
+    async def admit(self) -> None:
+        if self._is_full():
+            if self._backpressure is Backpressure.REJECT:
+                raise asyncio.QueueFull
+
+            self.spawn_workers()
+            await self._capacity()
+
+    def admit_nowait(self) -> None:
+        if self._is_full():
+            raise asyncio.QueueFull
+
     def propagate_exceptions(self, status: bool):
         self._exception_propagating = status
 
+    def worker_count(self) -> int:
+        return len(self._worker_tasks)
+
+    def _is_full(self) -> bool:
+        return 0 < self._max_queue_size <= self._queue.qsize() + self._deferred
+
+    async def _capacity(self) -> None:
+        while self._is_full():
+            waiter = self._loop.create_future()
+            self._capacity_waiters.append(waiter)
+            await waiter
+
+    def _release_capacity(self) -> None:
+        while self._capacity_waiters and not self._is_full():
+            waiter = self._capacity_waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(None)
+
     def _manage_workers(self) -> None:
-        queue_size = self._queue.qsize()
-        if queue_size > len(self._worker_tasks) * 2:
+        worker_count = len(self._worker_tasks)
+        if worker_count < self._max_workers and self._queue.qsize() > worker_count * 2:
+            self._add_worker()
+
+    def spawn_workers(self) -> None:
+        target = min(self._queue.qsize(), self._max_workers)
+        for _ in range(target - len(self._worker_tasks)):
             self._add_worker()
 
     def _add_worker(self) -> None:
-        worker_task = self._loop.create_task(self._worker())
-        self._worker_tasks.append(worker_task)
+        worker_task = self._context.copy().run(self._loop.create_task, self._worker())
+        self._worker_tasks.add(worker_task)
 
     async def _worker(self) -> None:
-        while True:
-            process = await self._queue.get()
-            try:
-                await process
-            except Exception as e:
-                self._exceptions.append(e)
-            finally:
-                self._queue.task_done()
+        queue = self._queue
+        worker_tasks = self._worker_tasks
+        cancelled = False
+
+        try:
+            while True:
+                if not queue.empty():
+                    process, key, scheduling = queue.get_nowait()
+                elif len(worker_tasks) > self._min_workers:
+                    # asyncio.wait() never swallows a cancellation of this worker, unlike
+                    # wait_for() before Python 3.12.
+                    getter = self._loop.create_task(queue.get())
+                    try:
+                        done, _ = await asyncio.wait((getter,), timeout=self._idle_timeout)
+                    except asyncio.CancelledError:
+                        if getter.done() and not getter.cancelled():
+                            # Hand an item the getter already took back, for _abandon() to close.
+                            queue.put_nowait(getter.result())
+                            queue.task_done()
+                        else:
+                            getter.cancel()
+                        raise
+                    if not done:
+                        getter.cancel()
+                        if len(worker_tasks) > self._min_workers:
+                            return
+                        continue
+                    process, key, scheduling = getter.result()
+                else:
+                    process, key, scheduling = await queue.get()
+
+                if self._capacity_waiters:
+                    self._release_capacity()
+
+                try:
+                    if scheduling is None:
+                        await process
+                    else:
+                        await self._run_scheduled(process, scheduling)
+                except Exception as e:
+                    self._record(e)
+                finally:
+                    if key is not None:
+                        if key in self._holds:
+                            self._holds.remove(key)
+                        else:
+                            self._advance_lane(key)
+                    self._pending -= 1
+                    queue.task_done()
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            if worker_tasks is self._worker_tasks:
+                self._retire_worker(respawn=not cancelled)
+
+    async def _run_scheduled(self, process: typing.Coroutine, scheduling: Scheduling) -> None:
+        if scheduling.deadline is not None and time.time() > scheduling.deadline:
+            self._drop(process, scheduling)
+            return
+
+        if scheduling.timeout is None:
+            await process
+            return
+
+        task = asyncio.current_task()
+        fired = []
+        timer = self._loop.call_later(scheduling.timeout, _cancel_timed_out, task, fired)
+        try:
+            await process
+        except asyncio.CancelledError:
+            if not fired:
+                raise
+            self._fail(HandlerTimeout(scheduling.timeout), scheduling)
+        finally:
+            timer.cancel()
+            if fired and hasattr(task, 'uncancel'):
+                task.uncancel()
+
+    def _drop(self, process: typing.Coroutine, scheduling: Scheduling) -> None:
+        # A wrapper that never started never reaches its own cleanup, so the coroutines it
+        # wraps are listed on the scheduling and closed here.
+        process.close()
+        for inner in scheduling.inner:
+            inner.close()
+        self._fail(DeadlineExceeded(scheduling.deadline), scheduling)
+
+    def _fail(self, exception: Exception, scheduling: Scheduling) -> None:
+        if scheduling.fail is None:
+            self._record(exception)
+        else:
+            scheduling.fail(exception)
+
+    def hold(self, key: typing.Hashable) -> None:
+        # Called from the running item of a lane: keep the lane reserved once it finishes,
+        # until the owner either resumes it or releases it.
+        self._holds.add(key)
+
+    def resume(self,
+               process: typing.Coroutine,
+               key: typing.Hashable,
+               scheduling: typing.Optional[Scheduling] = None) -> None:
+        self._pending += 1
+        self._queue.put_nowait((process, key, scheduling))
+        self._manage_workers()
+
+    def release(self, key: typing.Hashable) -> None:
+        self._advance_lane(key)
+
+    def _advance_lane(self, key: typing.Hashable) -> None:
+        lane = self._lanes[key]
+        if lane:
+            self._deferred -= 1
+            process, scheduling = lane.popleft()
+            self._queue.put_nowait((process, key, scheduling))
+        else:
+            del self._lanes[key]
+
+    def _retire_worker(self, respawn: bool = True) -> None:
+        try:
+            worker_task = asyncio.current_task()
+        except RuntimeError:
+            return
+
+        if worker_task in self._worker_tasks:
+            self._worker_tasks.remove(worker_task)
+            if self._worker_tasks:
+                return
+            # A cancelled worker is being torn down with its loop: a replacement would be left
+            # pending, so the work nobody is left to run is closed instead.
+            if not respawn:
+                self._abandon()
+            elif not self._queue.empty():
+                self._add_worker()
+
+    def _abandon(self) -> None:
+        abandoned = []
+        while not self._queue.empty():
+            process, _, scheduling = self._queue.get_nowait()
+            self._queue.task_done()
+            abandoned.append((process, scheduling))
+        for lane in self._lanes.values():
+            abandoned.extend(lane)
+        self._lanes.clear()
+        self._holds.clear()
+        self._deferred = 0
+        self._pending -= len(abandoned)
+
+        for process, scheduling in abandoned:
+            process.close()
+            for inner in scheduling.inner if scheduling is not None else ():
+                inner.close()
+
+    def drain_exceptions(self) -> typing.List[Exception]:
+        exceptions = list(self._exceptions)
+        self._exceptions.clear()
+        return exceptions
+
+    def _record(self, exception: Exception) -> None:
+        # Drop the loop's own frames from the traceback so a recorded exception neither pins
+        # a suspended worker nor lets traceback.clear_frames() close it when re-raised.
+        traceback = exception.__traceback__
+        while traceback is not None and traceback.tb_frame.f_globals is globals():
+            traceback = traceback.tb_next
+        exception.__traceback__ = traceback
+
+        if len(self._exceptions) == self._exceptions.maxlen:
+            self._exceptions_dropped += 1
+        self._exceptions.append(exception)
+
+    def _raise_exceptions(self) -> None:
+        if self._exception_propagating and self._exceptions:
+            raise self._exceptions.popleft()
 
     def is_processing(self) -> bool:
         return self._processing
 
     def process(self) -> None:
-        if not self._processing:
+        if not self._processing and not self._loop.is_running():
             self._processing = True
+            self.spawn_workers()
 
-            for _ in range(self._queue.qsize() - len(self._worker_tasks)):
-                self._add_worker()
+            try:
+                self._loop.run_until_complete(self._drain())
+            finally:
+                self._processing = False
+
+            self._raise_exceptions()
 
-            self._loop.run_until_complete(self._queue.join())
-            self._processing = False
+    async def join(self) -> None:
+        if self._in_loop_task():
+            return
 
-            if self._exception_propagating:
-                for exception in self._exceptions:
-                    raise exception
+        self.spawn_workers()
+        await self._drain()
+        self._raise_exceptions()
 
+    async def _drain(self) -> None:
+        while True:
+            await self._queue.join()
+            if self._eager_tasks:
+                await asyncio.wait(list(self._eager_tasks))
+            elif self._flushers:
+                self.flush()
+                self.spawn_workers()
+            elif self._delayed:
+                waiter = self._loop.create_future()
+                self._delay_waiters.append(waiter)
+                await waiter
+                self.spawn_workers()
+            else:
+                return
 
 
 __async_loop = None
 
-def get_async_loop() -> __AsyncLoop:
+def get_async_loop() -> AsyncLoop:
     global __async_loop
 
     if __async_loop is None:
-        __async_loop = __AsyncLoop()
+        __async_loop = AsyncLoop()
 
-    return __async_loop
\ No newline at end of file
+    return __async_loop
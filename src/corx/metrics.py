@@ -0,0 +1,180 @@
+import abc
+import bisect
+import collections
+import math
+import time
+import typing
+
+__all__ = [
+    'Exporter',
+    'Histogram',
+    'Metrics',
+    'PrometheusExporter',
+]
+
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram():
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds: typing.Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds) + (math.inf,)
+        self.counts = [0] * len(self.bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def buckets(self) -> typing.List[typing.Tuple[float, int]]:
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return buckets
+
+
+class Metrics():
+    def __init__(self, buckets: typing.Sequence[float] = DEFAULT_BUCKETS):
+        self._buckets = buckets
+        self._handlers: typing.Dict[str, Histogram] = {}
+        self._exceptions: typing.Dict[str, int] = collections.defaultdict(int)
+        self._dispatched: typing.Dict[str, int] = collections.defaultdict(int)
+        self._wait = Histogram(buckets)
+        self._loop = None
+
+    def bind(self, loop) -> None:
+        self._loop = loop
+
+    def count_dispatch(self, dispatchable_class: type) -> None:
+        self._dispatched[dispatchable_class.__qualname__] += 1
+
+    def observe_handler(self, handler: str, seconds: float) -> None:
+        histogram = self._handlers.get(handler)
+        if histogram is None:
+            histogram = self._handlers[handler] = Histogram(self._buckets)
+        histogram.observe(seconds)
+
+    def count_exception(self, handler: str) -> None:
+        self._exceptions[handler] += 1
+
+    def observe_wait(self, seconds: float) -> None:
+        self._wait.observe(seconds)
+
+    def call(self, handler: str, target: typing.Callable, dispatchable) -> typing.Any:
+        start = time.perf_counter()
+        try:
+            result = target(dispatchable)
+        except Exception:
+            self.count_exception(handler)
+            self.observe_handler(handler, time.perf_counter() - start)
+            raise
+
+        if not isinstance(result, typing.Coroutine):
+            self.observe_handler(handler, time.perf_counter() - start)
+        return result
+
+    async def timed(self, handler: str, process: typing.Awaitable, queued: float) -> typing.Any:
+        start = time.perf_counter()
+        self.observe_wait(start - queued)
+        try:
+            return await process
+        except Exception:
+            self.count_exception(handler)
+            raise
+        finally:
+            self.observe_handler(handler, time.perf_counter() - start)
+
+    def snapshot(self) -> typing.Dict[str, typing.Any]:
+        return {
+            'dispatched': dict(self._dispatched),
+            'handlers': {
+                handler: {
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'buckets': histogram.buckets(),
+                    'exceptions': self._exceptions.get(handler, 0),
+                }
+                for handler, histogram in self._handlers.items()
+            },
+            'wait': {
+                'count': self._wait.count,
+                'sum': self._wait.sum,
+                'buckets': self._wait.buckets(),
+            },
+            'loop': {} if self._loop is None else self._loop.stats(),
+        }
+
+    def reset(self) -> None:
+        self._handlers.clear()
+        self._exceptions.clear()
+        self._dispatched.clear()
+        self._wait = Histogram(self._buckets)
+
+    def export(self, *exporters: 'Exporter') -> None:
+        snapshot = self.snapshot()
+        for exporter in exporters:
+            exporter.export(snapshot)
+
+
+class Exporter(abc.ABC):
+    @abc.abstractmethod
+    def export(self, snapshot: typing.Dict[str, typing.Any]) -> None:
+        raise NotImplementedError
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _bound(value: float) -> str:
+    return '+Inf' if value == math.inf else repr(value)
+
+
+class PrometheusExporter(Exporter):
+    def __init__(self, write: typing.Optional[typing.Callable[[str], typing.Any]] = None, prefix: str = 'corx'):
+        self._write = write
+        self._prefix = prefix
+
+    def export(self, snapshot: typing.Dict[str, typing.Any]) -> None:
+        if self._write is not None:
+            self._write(self.render(snapshot))
+
+    def render(self, snapshot: typing.Dict[str, typing.Any]) -> str:
+        prefix = self._prefix
+        lines = []
+
+        lines.append(f'# TYPE {prefix}_dispatched_total counter')
+        for name, count in sorted(snapshot['dispatched'].items()):
+            lines.append(f'{prefix}_dispatched_total{{type="{_label(name)}"}} {count}')
+
+        lines.append(f'# TYPE {prefix}_handler_seconds histogram')
+        for name, histogram in sorted(snapshot['handlers'].items()):
+            self._histogram(lines, f'{prefix}_handler_seconds', histogram, f'handler="{_label(name)}"')
+
+        lines.append(f'# TYPE {prefix}_handler_exceptions_total counter')
+        for name, histogram in sorted(snapshot['handlers'].items()):
+            lines.append(f'{prefix}_handler_exceptions_total{{handler="{_label(name)}"}} {histogram["exceptions"]}')
+
+        lines.append(f'# TYPE {prefix}_queue_wait_seconds histogram')
+        self._histogram(lines, f'{prefix}_queue_wait_seconds', snapshot['wait'])
+
+        for name, value in snapshot['loop'].items():
+            lines.append(f'# TYPE {prefix}_{name} gauge')
+            lines.append(f'{prefix}_{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram(lines: typing.List[str], name: str, histogram: typing.Dict[str, typing.Any], labels: str = '') -> None:
+        separator = ',' if labels else ''
+        for bound, count in histogram['buckets']:
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{_bound(bound)}"}} {count}')
+
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {histogram["sum"]}')
+        lines.append(f'{name}_count{suffix} {histogram["count"]}')
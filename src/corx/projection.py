@@ -0,0 +1,274 @@
+import abc
+import itertools
+import json
+import os
+import typing
+
+from corx.dispatcher import Dispatcher, get_dispatcher
+from corx.event import AnyEvent, Event, EventType
+
+__all__ = [
+    'CheckpointStore',
+    'FileCheckpointStore',
+    'MemoryCheckpointStore',
+    'Projection',
+    'ProjectionEngine',
+]
+
+
+class Projection(abc.ABC):
+    name: typing.ClassVar[typing.Optional[str]] = None
+    events: typing.ClassVar[typing.Tuple[EventType, ...]] = (Event,)
+
+    @abc.abstractmethod
+    def project(self, event: Event) -> None:
+        raise NotImplementedError
+
+    def project_batch(self, events: typing.Sequence[Event]) -> None:
+        for event in events:
+            self.project(event)
+
+    @property
+    def projection_name(self) -> str:
+        return self.name or type(self).__qualname__
+
+
+class CheckpointStore(abc.ABC):
+    @abc.abstractmethod
+    def load(self, name: str) -> int:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def save(self, name: str, position: int) -> None:
+        raise NotImplementedError
+
+
+class MemoryCheckpointStore(CheckpointStore):
+    def __init__(self):
+        self._positions: typing.Dict[str, int] = {}
+
+    def load(self, name: str) -> int:
+        return self._positions.get(name, 0)
+
+    def save(self, name: str, position: int) -> None:
+        self._positions[name] = position
+
+
+class FileCheckpointStore(CheckpointStore):
+    def __init__(self, path: str):
+        self._path = path
+        self._positions: typing.Dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                self._positions = json.load(file)
+
+    def load(self, name: str) -> int:
+        return self._positions.get(name, 0)
+
+    def save(self, name: str, position: int) -> None:
+        if self._positions.get(name) == position:
+            return
+
+        self._positions[name] = position
+        temporary = f'{self._path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(self._positions, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self._path)
+
+
+class _Cursor():
+    __slots__ = ('projection', 'name', 'position', 'saved', 'replayed')
+
+    def __init__(self, projection: Projection, position: int):
+        self.projection = projection
+        self.name = projection.projection_name
+        self.position = position
+        self.saved = position
+        self.replayed: typing.Optional[typing.Set[int]] = None
+
+
+class ProjectionEngine():
+    def __init__(self,
+                 store: typing.Any,
+                 checkpoints: typing.Optional[CheckpointStore] = None,
+                 batch_size: int = 512,
+                 checkpoint_every: int = 512,
+                 dispatcher: typing.Optional[Dispatcher] = None):
+        self._store = store
+        self._checkpoints = checkpoints or MemoryCheckpointStore()
+        self._batch_size = batch_size
+        self._checkpoint_every = checkpoint_every
+        self._dispatcher = dispatcher
+        self._cursors: typing.List[_Cursor] = []
+        self._parked: typing.Optional[typing.List[Event]] = None
+        self._registered = False
+        self._live = False
+
+    def add(self, projection: Projection) -> Projection:
+        if any(cursor.name == projection.projection_name for cursor in self._cursors):
+            raise Exception(f'Projection {projection.projection_name} is already added.')
+
+        cursor = _Cursor(projection, self._checkpoints.load(projection.projection_name))
+        if not self._live:
+            self._cursors.append(cursor)
+        elif self._dispatcher.loop.is_foreign_thread():
+            self._dispatcher.loop.submit(self._join, cursor).result()
+        else:
+            self._catch_up(cursor)
+            self._cursors.append(cursor)
+        return projection
+
+    def position(self, projection: Projection) -> int:
+        return self._cursor(projection).position
+
+    def start(self) -> 'ProjectionEngine':
+        if self._live:
+            return self
+
+        self._dispatcher = self._dispatcher or get_dispatcher()
+        loop = self._dispatcher.loop
+        if loop.is_foreign_thread():
+            # With the loop in its own thread, events keep arriving while the store is read,
+            # so they are parked until every cursor has caught up and replayed ids dropped then.
+            self._parked = []
+            for cursor in self._cursors:
+                cursor.replayed = set()
+            try:
+                loop.submit(self._settle).result()
+                for cursor in self._cursors:
+                    self._catch_up(cursor)
+            except BaseException:
+                loop.submit(self._unlisten).result()
+                raise
+            self._live = True
+            loop.submit(self._hand_off).result()
+        else:
+            for cursor in self._cursors:
+                self._catch_up(cursor)
+            self._listen()
+            self._live = True
+        return self
+
+    def stop(self) -> None:
+        if self._live:
+            loop = self._dispatcher.loop
+            if loop.is_foreign_thread():
+                loop.submit(self._unlisten).result()
+            else:
+                self._dispatcher.deactivate(self._react)
+            self._live = False
+        self.checkpoint()
+
+    def checkpoint(self) -> None:
+        for cursor in self._cursors:
+            self._save(cursor)
+
+    def catch_up(self) -> int:
+        return sum(self._catch_up(cursor) for cursor in self._cursors)
+
+    def _listen(self) -> None:
+        if self._registered:
+            self._dispatcher.activate(self._react)
+        else:
+            self._dispatcher.register(AnyEvent, self._react)
+            self._registered = True
+
+    async def _settle(self) -> None:
+        # Listener plans are rebuilt on the loop thread, and events fanned out before the
+        # engine listens may still be on their way to the store.
+        self._listen()
+        await self._dispatcher.loop.join()
+
+    async def _hand_off(self) -> None:
+        # Running on the loop thread, no reaction is half way through its fan-out here, so
+        # an event the store replayed has already been parked.
+        parked, self._parked = self._parked, None
+        failure = None
+        for cursor in self._cursors:
+            replayed, cursor.replayed = cursor.replayed, None
+            for event in parked:
+                if event._id not in replayed:
+                    try:
+                        self._apply(cursor, event)
+                    except Exception as e:
+                        failure = failure or e
+
+        if failure is not None:
+            raise failure
+
+    async def _unlisten(self) -> None:
+        self._dispatcher.deactivate(self._react)
+        self._parked = None
+        for cursor in self._cursors:
+            cursor.replayed = None
+
+    async def _join(self, cursor: _Cursor) -> None:
+        self._catch_up(cursor)
+        self._cursors.append(cursor)
+
+    def _catch_up(self, cursor: _Cursor) -> int:
+        projection, events = cursor.projection, cursor.projection.events
+        replay = self._store.replay(cursor.position)
+        replayed = cursor.replayed
+        applied = 0
+
+        while True:
+            batch = list(itertools.islice(replay, self._batch_size))
+            if not batch:
+                break
+
+            if replayed is not None:
+                replayed.update(event._id for event in batch)
+            selected = [event for event in batch if isinstance(event, events)]
+            if selected:
+                projection.project_batch(selected)
+            cursor.position += len(batch)
+            applied += len(batch)
+            self._save(cursor)
+
+        return applied
+
+    def _react(self, event: Event) -> None:
+        # Every cursor moves past the event, even when a projection fails on it, so the live
+        # positions keep matching the store.
+        if self._parked is not None:
+            self._parked.append(event)
+            return
+
+        failure = None
+        for cursor in self._cursors:
+            try:
+                self._apply(cursor, event)
+            except Exception as e:
+                failure = failure or e
+
+        if failure is not None:
+            raise failure
+
+    def _apply(self, cursor: _Cursor, event: Event) -> None:
+        try:
+            if isinstance(event, cursor.projection.events):
+                cursor.projection.project(event)
+        finally:
+            cursor.position += 1
+            if cursor.position - cursor.saved >= self._checkpoint_every:
+                self._save(cursor)
+
+    def _save(self, cursor: _Cursor) -> None:
+        if cursor.position != cursor.saved:
+            self._checkpoints.save(cursor.name, cursor.position)
+            cursor.saved = cursor.position
+
+    def _cursor(self, projection: Projection) -> _Cursor:
+        for cursor in self._cursors:
+            if cursor.projection is projection:
+                return cursor
+        raise Exception(f'Projection {projection.projection_name} is not added.')
+
+    def __enter__(self) -> 'ProjectionEngine':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,77 @@
+import collections
+import copy
+import typing
+
+from corx.event import Event
+
+__all__ = [
+    'AggregateRepository',
+]
+
+_T = typing.TypeVar('_T')
+
+
+class AggregateRepository(typing.Generic[_T]):
+    def __init__(self,
+                 store: typing.Any,
+                 factory: typing.Callable[[], _T],
+                 snapshot_every: int = 100,
+                 cache_size: int = 1024,
+                 snapshots: typing.Optional[typing.MutableMapping[typing.Any, typing.Tuple[int, _T]]] = None):
+        self._store = store
+        self._factory = factory
+        self._snapshot_every = snapshot_every
+        self._cache_size = cache_size
+        self._cache: typing.Dict[typing.Any, typing.Tuple[_T, int]] = collections.OrderedDict()
+        self._snapshots = {} if snapshots is None else snapshots
+
+    def load(self, aggregate_id: typing.Any) -> _T:
+        return self._load(aggregate_id)[0]
+
+    def version(self, aggregate_id: typing.Any) -> int:
+        return self._load(aggregate_id)[1]
+
+    def evict(self, aggregate_id: typing.Any) -> None:
+        self._cache.pop(aggregate_id, None)
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._snapshots.clear()
+
+    def _load(self, aggregate_id: typing.Any) -> typing.Tuple[_T, int]:
+        cached = self._cache.get(aggregate_id)
+        if cached is None:
+            aggregate, applied = self._restore(aggregate_id)
+        else:
+            aggregate, applied = cached
+            self._cache.move_to_end(aggregate_id)
+
+        events = self._store.get_by_aggregate(aggregate_id, applied)
+        if events or cached is None:
+            applied = self._fold(aggregate_id, aggregate, applied, events)
+            self._remember(aggregate_id, aggregate, applied)
+
+        return aggregate, applied
+
+    def _restore(self, aggregate_id: typing.Any) -> typing.Tuple[_T, int]:
+        snapshot = self._snapshots.get(aggregate_id)
+        if snapshot is None:
+            return self._factory(), 0
+
+        applied, aggregate = snapshot
+        return copy.deepcopy(aggregate), applied
+
+    def _fold(self, aggregate_id: typing.Any, aggregate: _T, applied: int, events: typing.Iterable[Event]) -> int:
+        for event in events:
+            event.apply(aggregate)
+            applied += 1
+
+            if applied % self._snapshot_every == 0:
+                self._snapshots[aggregate_id] = (applied, copy.deepcopy(aggregate))
+
+        return applied
+
+    def _remember(self, aggregate_id: typing.Any, aggregate: _T, applied: int) -> None:
+        self._cache[aggregate_id] = (aggregate, applied)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
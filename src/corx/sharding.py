@@ -0,0 +1,279 @@
+import asyncio
+import concurrent.futures
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+import time
+import typing
+import zlib
+
+from corx.codec import Codec
+from corx.command import Command
+from corx.dispatcher import Dispatcher, Executor, Handle, get_dispatcher
+from corx.event import Event
+
+__all__ = [
+    'ShardFailed',
+    'ShardedDispatcher',
+]
+
+
+class ShardFailed(Exception):
+    def __init__(self, shard: int, reason: str):
+        super().__init__(f'Shard {shard} {reason}.')
+        self.shard = shard
+
+
+class _Collector(Executor):
+    def __init__(self):
+        super().__init__()
+        self._dispatchables: typing.List[typing.Union[Command, Event]] = []
+
+    def register(self, dispatchable, executable, execution=None):
+        ...
+
+    def execute(self, dispatchable: typing.Union[Command, Event]):
+        self._dispatchables.append(dispatchable)
+
+    def drain(self) -> typing.List[typing.Union[Command, Event]]:
+        dispatchables, self._dispatchables = self._dispatchables, []
+        return dispatchables
+
+
+class _CommandRouter(Executor):
+    # Runs the command the shard was handed and collects the ones its handlers dispatch, so the
+    # coordinator can partition them again.
+    def __init__(self, local: Executor, collector: _Collector):
+        super().__init__()
+        self._local = local
+        self._collector = collector
+        self.admitted: typing.Optional[Command] = None
+
+    def register(self, dispatchable, executable, execution=None):
+        self._local.register(dispatchable, executable, execution)
+
+    def set_timeout(self, executable, timeout):
+        self._local.set_timeout(executable, timeout)
+
+    def set_retry(self, executable, policy):
+        self._local.set_retry(executable, policy)
+
+    def execute(self, dispatchable: Command):
+        if dispatchable is self.admitted:
+            self._local.execute(dispatchable)
+        else:
+            self._collector.execute(dispatchable)
+
+    def submit(self, dispatchable: Command, handle: Handle):
+        if dispatchable is self.admitted:
+            self._local.submit(dispatchable, handle)
+        else:
+            super().submit(dispatchable, handle)
+
+
+def _portable(exception: BaseException) -> BaseException:
+    try:
+        pickle.dumps(exception)
+        return exception
+    except Exception:
+        return Exception(repr(exception))
+
+
+def _run_shard(initializer: typing.Optional[typing.Callable[[], None]],
+               commands: multiprocessing.Queue,
+               results: multiprocessing.Queue) -> None:
+    if initializer is not None:
+        initializer()
+
+    dispatcher = get_dispatcher()
+    collector = _Collector()
+    router = _CommandRouter(dispatcher._resolve(Command), collector)
+    dispatcher.register_executor(Event, collector)
+    dispatcher.register_executor(Command, router)
+    codec = Codec()
+
+    while True:
+        item = commands.get()
+        if item is None:
+            break
+
+        ticket, payload = item
+        router.admitted = codec.decode(payload)
+        try:
+            result = pickle.dumps(dispatcher.submit(router.admitted).result())
+            exceptions = dispatcher.drain_exceptions()
+            if exceptions:
+                raise exceptions[0]
+            results.put((ticket, codec.encode_many(collector.drain()), result, None))
+        except Exception as e:
+            collector.drain()
+            results.put((ticket, b'', None, _portable(e)))
+        finally:
+            router.admitted = None
+
+
+class _ShardExecutor(Executor):
+    # Shards register their handlers through the initializer; one registered here goes to the
+    # executor this one replaced, which takes over again once the shards are closed.
+    def __init__(self, sharded: 'ShardedDispatcher', local: Executor):
+        super().__init__()
+        self._sharded = sharded
+        self._local = local
+
+    def register(self, dispatchable, executable, execution=None):
+        self._local.register(dispatchable, executable, execution)
+
+    def set_timeout(self, executable, timeout):
+        self._local.set_timeout(executable, timeout)
+
+    def set_retry(self, executable, policy):
+        self._local.set_retry(executable, policy)
+
+    def execute(self, dispatchable: Command):
+        self._loop.push(self._sharded.receive(self._sharded.send(dispatchable)))
+
+    def submit(self, dispatchable: Command, handle: Handle):
+        self._loop.push(handle.follow(self._sharded.receive(self._sharded.send(dispatchable))))
+
+
+class ShardedDispatcher():
+    def __init__(self,
+                 shards: typing.Optional[int] = None,
+                 initializer: typing.Optional[typing.Callable[[], None]] = None,
+                 context: typing.Optional[multiprocessing.context.BaseContext] = None,
+                 dispatcher: typing.Optional[Dispatcher] = None,
+                 poll_interval: float = 0.1):
+        self._dispatcher = dispatcher
+        self._shard_count = shards or os.cpu_count() or 1
+        self._initializer = initializer
+        self._context = context or multiprocessing.get_context('spawn')
+        self._poll_interval = poll_interval
+        self._codec = Codec()
+        self._tickets = itertools.count()
+        self._pending: typing.Dict[int, typing.Tuple[int, concurrent.futures.Future]] = {}
+        self._failed: typing.Dict[int, str] = {}
+        self._round_robin = itertools.cycle(range(self._shard_count))
+        self._inboxes: typing.List[multiprocessing.Queue] = []
+        self._processes: typing.List[multiprocessing.Process] = []
+        self._results: typing.Optional[multiprocessing.Queue] = None
+        self._reader: typing.Optional[threading.Thread] = None
+        self._previous_executor: typing.Optional[Executor] = None
+
+    def start(self) -> 'ShardedDispatcher':
+        self._results = self._context.Queue()
+        for _ in range(self._shard_count):
+            inbox = self._context.Queue()
+            process = self._context.Process(target=_run_shard, args=(self._initializer, inbox, self._results), daemon=True)
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+
+        self._reader = threading.Thread(target=self._read_results, name='corx-shard-results', daemon=True)
+        self._reader.start()
+
+        self._dispatcher = self._dispatcher or get_dispatcher()
+        self._previous_executor = self._dispatcher._resolve(Command)
+        self._dispatcher.register_executor(Command, _ShardExecutor(self, self._previous_executor))
+        return self
+
+    def close(self, timeout: typing.Optional[float] = 5.0) -> None:
+        if self._previous_executor is not None:
+            self._dispatcher.register_executor(Command, self._previous_executor)
+            self._previous_executor = None
+
+        for inbox in self._inboxes:
+            inbox.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for process in self._processes:
+            process.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        if self._results is not None:
+            self._results.put(None)
+            self._reader.join(timeout)
+            self._results = None
+
+        for shard in range(self._shard_count):
+            self._fail(shard, 'was closed')
+        self._inboxes.clear()
+        self._processes.clear()
+        self._failed.clear()
+
+    def shard_of(self, command: Command) -> int:
+        key = command.partition_key()
+        if key is None:
+            return next(self._round_robin)
+        return zlib.crc32(repr(key).encode()) % self._shard_count
+
+    def send(self, command: Command) -> concurrent.futures.Future:
+        shard = self.shard_of(command)
+        ticket = next(self._tickets)
+        future = concurrent.futures.Future()
+        self._pending[ticket] = (shard, future)
+
+        # The reader marks a shard failed before it fails the shard's tickets, so whichever
+        # side pops the ticket settles it.
+        reason = self._failed.get(shard)
+        if reason is not None:
+            if self._pending.pop(ticket, None) is not None:
+                future.set_exception(ShardFailed(shard, reason))
+            return future
+
+        self._inboxes[shard].put((ticket, self._codec.encode(command)))
+        return future
+
+    async def receive(self, future: concurrent.futures.Future) -> typing.Any:
+        payload, result = await asyncio.wrap_future(future)
+        dispatchables = self._codec.decode_many(payload)
+        if dispatchables:
+            self._dispatcher.dispatch(*dispatchables)
+        return pickle.loads(result)
+
+    def _read_results(self) -> None:
+        exited: typing.Dict[int, str] = {}
+        while True:
+            try:
+                item = self._results.get(timeout=self._poll_interval)
+            except queue.Empty:
+                exited = self._check_shards(exited)
+                continue
+
+            if item is None:
+                break
+
+            ticket, payload, result, error = item
+            _, future = self._pending.pop(ticket, (None, None))
+            if future is None:
+                continue
+            if error is None:
+                future.set_result((payload, result))
+            else:
+                future.set_exception(error)
+
+    def _check_shards(self, exited: typing.Dict[int, str]) -> typing.Dict[int, str]:
+        # A shard seen dead is failed on the next quiet poll, once the results it flushed before
+        # exiting have been read.
+        for shard, reason in exited.items():
+            self._failed[shard] = reason
+            self._fail(shard, reason)
+
+        return {
+            shard: f'exited with code {process.exitcode}'
+            for shard, process in enumerate(self._processes)
+            if shard not in self._failed and not process.is_alive()
+        }
+
+    def _fail(self, shard: int, reason: str) -> None:
+        for ticket, (owner, future) in list(self._pending.items()):
+            if owner == shard and self._pending.pop(ticket, None) is not None:
+                future.set_exception(ShardFailed(shard, reason))
+
+    def __enter__(self) -> 'ShardedDispatcher':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
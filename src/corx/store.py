@@ -0,0 +1,470 @@
+import mmap
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import typing
+
+from corx.event import ConcurrencyError, Event, EventStore, EventType, assign_version, check_version
+from corx.loop import AsyncLoop, get_async_loop
+
+__all__ = [
+    'FileEventStore',
+    'SqliteEventStore',
+]
+
+_HEADER = struct.Struct('>IHH')
+
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS events (
+        position INTEGER PRIMARY KEY AUTOINCREMENT,
+        uuid TEXT NOT NULL UNIQUE,
+        type TEXT NOT NULL,
+        aggregate_id,
+        version INTEGER,
+        timestamp REAL,
+        payload BLOB NOT NULL
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS events_type ON events (type, position)',
+    'CREATE INDEX IF NOT EXISTS events_aggregate ON events (aggregate_id, position)',
+    'CREATE INDEX IF NOT EXISTS events_timestamp ON events (timestamp)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS events_stream ON events (aggregate_id, version) WHERE aggregate_id IS NOT NULL',
+    'CREATE INDEX IF NOT EXISTS events_type_stream ON events (type, version) WHERE aggregate_id IS NULL',
+)
+
+_INSERT = (
+    'INSERT INTO events (uuid, type, aggregate_id, version, timestamp, payload) VALUES (?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT (uuid) DO UPDATE SET payload = excluded.payload'
+)
+
+
+def _type_key(event_type: EventType) -> bytes:
+    return f'{event_type.__module__}:{event_type.__qualname__}'.encode()
+
+
+def _aggregate_key(aggregate_id: typing.Any) -> bytes:
+    return b'' if aggregate_id is None else pickle.dumps(aggregate_id, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class _Segment():
+    def __init__(self, path: str, base: int):
+        self.path = path
+        self.base = base
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+        self._writer: typing.Optional[typing.BinaryIO] = None
+        self._reader: typing.Optional[typing.BinaryIO] = None
+        self._map: typing.Optional[mmap.mmap] = None
+
+    def write(self, record: bytes) -> int:
+        if self._writer is None:
+            self._writer = open(self.path, 'ab')
+
+        offset = self.size
+        self._writer.write(record)
+        self.size += len(record)
+        return offset
+
+    def sync(self) -> None:
+        if self._writer is not None:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+
+    def view(self, end: int) -> memoryview:
+        if self._map is None or len(self._map) < end:
+            if self._writer is not None:
+                self._writer.flush()
+            self._unmap()
+            self._reader = open(self.path, 'rb')
+            self._map = mmap.mmap(self._reader.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return memoryview(self._map)
+
+    def truncate(self, size: int) -> None:
+        self._unmap()
+        with open(self.path, 'r+b') as file:
+            file.truncate(size)
+        self.size = size
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._unmap()
+
+    def _unmap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+
+class FileEventStore(EventStore):
+    def __init__(self,
+                 directory: str,
+                 segment_size: int = 64 * 1024 * 1024,
+                 sync_every: int = 256,
+                 sync_interval: float = 0.05,
+                 loop: typing.Optional[AsyncLoop] = None):
+        super().__init__()
+        self._directory = directory
+        self._loop = loop
+        self._pinned = loop is not None
+        self._segment_size = segment_size
+        self._sync_every = sync_every
+        self._sync_interval = sync_interval
+        self._segments: typing.List[_Segment] = []
+        self._positions: typing.List[typing.Tuple[int, int]] = []
+        self._versions: typing.List[int] = []
+        self._by_type: typing.Dict[bytes, typing.List[int]] = {}
+        self._by_aggregate: typing.Dict[bytes, typing.List[int]] = {}
+        self._unsynced = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def append(self, event: Event, expected_version: typing.Optional[int] = None) -> int:
+        key = _type_key(type(event))
+        aggregate_id = getattr(event, 'aggregate_id', None)
+        aggregate_key = _aggregate_key(aggregate_id)
+
+        if aggregate_key:
+            stream, stream_positions = aggregate_id, self._by_aggregate.get(aggregate_key, ())
+        else:
+            stream, stream_positions = type(event), self._by_type.get(key, ())
+
+        if expected_version is None:
+            expected_version = event.expected_version
+        assign_version(event, check_version(stream, len(stream_positions), expected_version))
+
+        payload = pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)
+        record = _HEADER.pack(len(payload), len(key), len(aggregate_key)) + key + aggregate_key + payload
+
+        segment = self._segments[-1] if self._segments else None
+        if segment is None or (segment.size and segment.size + len(record) > self._segment_size):
+            segment = self._rotate()
+
+        position = len(self._positions)
+        self._positions.append((len(self._segments) - 1, segment.write(record)))
+        self._index(position, key, aggregate_key)
+
+        self._unsynced += 1
+        if self._unsynced >= self._sync_every:
+            self.sync()
+        elif self._unsynced == 1:
+            self._timers().schedule_flush(self.sync, self._sync_interval)
+
+        return position
+
+    def seed_events(self, *events: Event):
+        for event in events:
+            self.append(event)
+        self.sync()
+
+    def sync(self) -> None:
+        if self._loop is not None:
+            self._loop.cancel_flush(self.sync)
+        if self._unsynced and self._segments:
+            self._segments[-1].sync()
+        self._unsynced = 0
+
+    def bind(self, loop: AsyncLoop) -> None:
+        # Unless given one, the store syncs on the loop of the dispatcher it is registered with.
+        if not self._pinned and loop is not self._loop:
+            self.sync()
+            self._loop = loop
+
+    def replay(self, start: int = 0) -> typing.Iterator[Event]:
+        for position in range(start, len(self._positions)):
+            yield self._read(position)
+
+    def get(self) -> typing.List[Event]:
+        return list(self.replay())
+
+    def get_by_type(self, event_type: EventType) -> typing.List[Event]:
+        return [self._read(position) for position in self._by_type.get(_type_key(event_type), [])]
+
+    def get_by_aggregate(self, aggregate_id: typing.Any, start: int = 0) -> typing.List[Event]:
+        return [self._read(position) for position in self._by_aggregate.get(_aggregate_key(aggregate_id), [])[start:]]
+
+    def get_version(self, aggregate_id: typing.Any) -> int:
+        return len(self._by_aggregate.get(_aggregate_key(aggregate_id), ()))
+
+    def get_latest_by_type(self, event_type: EventType) -> Event:
+        positions = self._by_type.get(_type_key(event_type))
+        if not positions:
+            raise Exception(f'No {event_type.__name__} events stored.')
+        return self._read(positions[-1])
+
+    def clear(self):
+        self.close()
+        for segment in self._segments:
+            os.remove(segment.path)
+        self._segments.clear()
+        self._positions.clear()
+        self._versions.clear()
+        self._by_type.clear()
+        self._by_aggregate.clear()
+
+    def close(self) -> None:
+        self.sync()
+        for segment in self._segments:
+            segment.close()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _timers(self) -> AsyncLoop:
+        if self._loop is None:
+            self._loop = get_async_loop()
+        return self._loop
+
+    def _index(self, position: int, key: bytes, aggregate_key: bytes) -> None:
+        stream_positions = self._by_type.setdefault(key, [])
+        stream_positions.append(position)
+        if aggregate_key:
+            stream_positions = self._by_aggregate.setdefault(aggregate_key, [])
+            stream_positions.append(position)
+        self._versions.append(len(stream_positions))
+
+    def _rotate(self) -> _Segment:
+        if self._segments:
+            self.sync()
+            self._segments[-1].close()
+
+        base = len(self._positions)
+        segment = _Segment(os.path.join(self._directory, f'{base:020d}.log'), base)
+        self._segments.append(segment)
+        return segment
+
+    def _read(self, position: int) -> Event:
+        segment_index, offset = self._positions[position]
+        segment = self._segments[segment_index]
+
+        with segment.view(offset + _HEADER.size) as view:
+            payload_size, key_size, aggregate_key_size = _HEADER.unpack_from(view, offset)
+            start = offset + _HEADER.size + key_size + aggregate_key_size
+            with view[start:start + payload_size] as payload:
+                event = pickle.loads(payload)
+
+        event.version = self._versions[position]
+        return event
+
+    def _load(self) -> None:
+        names = sorted(name for name in os.listdir(self._directory) if name.endswith('.log'))
+
+        for name in names:
+            segment = _Segment(os.path.join(self._directory, name), len(self._positions))
+            self._segments.append(segment)
+            if not segment.size:
+                continue
+
+            offset = 0
+            with segment.view(segment.size) as view:
+                while offset + _HEADER.size <= segment.size:
+                    payload_size, key_size, aggregate_key_size = _HEADER.unpack_from(view, offset)
+                    key_start = offset + _HEADER.size
+                    aggregate_key_start = key_start + key_size
+                    end = aggregate_key_start + aggregate_key_size + payload_size
+                    if end > segment.size:
+                        break
+
+                    self._index(
+                        len(self._positions),
+                        bytes(view[key_start:aggregate_key_start]),
+                        bytes(view[aggregate_key_start:aggregate_key_start + aggregate_key_size]))
+                    self._positions.append((len(self._segments) - 1, offset))
+                    offset = end
+
+            if offset < segment.size:
+                segment.truncate(offset)
+
+
+class SqliteEventStore(EventStore):
+    def __init__(self,
+                 database: str,
+                 batch_size: int = 512,
+                 flush_interval: float = 0.05,
+                 loop: typing.Optional[AsyncLoop] = None):
+        super().__init__()
+        # The store is written from the loop thread and read from anywhere, so the connection
+        # is shared across threads and every use of it goes through the lock.
+        self._connection = sqlite3.connect(database, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._loop = loop
+        self._pinned = loop is not None
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._buffer: typing.List[typing.Tuple] = []
+        self._stored: typing.Dict[str, int] = {}
+        self._versions: typing.Dict[typing.Tuple[bool, typing.Any], int] = {}
+
+        with self._connection:
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+
+    def append(self, event: Event, expected_version: typing.Optional[int] = None) -> None:
+        key = _type_key(type(event)).decode()
+        aggregate_id = getattr(event, 'aggregate_id', None)
+        stream = (True, aggregate_id) if aggregate_id is not None else (False, key)
+        uuid = event.uuid
+
+        with self._lock:
+            # Appending a stored event again rewrites its payload but keeps its place in the stream.
+            version = self._stored.get(uuid)
+            if version is None:
+                if expected_version is None:
+                    expected_version = event.expected_version
+                version = self._versions[stream] = check_version(stream[1], self._stream_version(stream), expected_version)
+                self._stored[uuid] = version
+            assign_version(event, version)
+
+            self._buffer.append((
+                uuid,
+                key,
+                aggregate_id,
+                version,
+                event.timestamp,
+                pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL),
+            ))
+
+            if len(self._buffer) >= self._batch_size:
+                self.flush()
+            elif len(self._buffer) == 1:
+                self._timers().schedule_flush(self.flush, self._flush_interval)
+
+    def seed_events(self, *events: Event):
+        for event in events:
+            self.append(event)
+        self.flush()
+
+    def flush(self) -> None:
+        if self._loop is not None:
+            self._loop.cancel_flush(self.flush)
+        with self._lock:
+            if self._buffer:
+                buffer, self._buffer = self._buffer, []
+                self._restore_versions(buffer)
+                try:
+                    with self._connection:
+                        self._connection.executemany(_INSERT, buffer)
+                except sqlite3.IntegrityError:
+                    self._insert_each(buffer)
+
+    def bind(self, loop: AsyncLoop) -> None:
+        # Unless given one, the store flushes on the loop of the dispatcher it is registered with.
+        if not self._pinned and loop is not self._loop:
+            self.flush()
+            self._loop = loop
+
+    def get_version(self, aggregate_id: typing.Any) -> int:
+        with self._lock:
+            return self._stream_version((True, aggregate_id))
+
+    def replay(self, start: int = 0) -> typing.Iterator[Event]:
+        return self._query('SELECT payload, version FROM events ORDER BY position LIMIT -1 OFFSET ?', start)
+
+    def get(self) -> typing.List[Event]:
+        return list(self.replay())
+
+    def get_by_type(self, event_type: EventType) -> typing.List[Event]:
+        return list(self._query('SELECT payload, version FROM events WHERE type = ? ORDER BY position', _type_key(event_type).decode()))
+
+    def get_by_aggregate(self, aggregate_id: typing.Any, start: int = 0) -> typing.List[Event]:
+        return list(self._query('SELECT payload, version FROM events WHERE aggregate_id = ? ORDER BY position LIMIT -1 OFFSET ?', aggregate_id, start))
+
+    def get_between(self, start: float, end: float) -> typing.List[Event]:
+        return list(self._query('SELECT payload, version FROM events WHERE timestamp >= ? AND timestamp < ? ORDER BY position', start, end))
+
+    def get_latest_by_type(self, event_type: EventType) -> Event:
+        for event in self._query('SELECT payload, version FROM events WHERE type = ? ORDER BY position DESC LIMIT 1', _type_key(event_type).decode()):
+            return event
+        raise Exception(f'No {event_type.__name__} events stored.')
+
+    def clear(self):
+        with self._lock:
+            self._buffer.clear()
+            self._stored.clear()
+            self._versions.clear()
+            self.flush()
+            with self._connection:
+                self._connection.execute('DELETE FROM events')
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self._connection.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self.flush()
+            return self._connection.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+
+    def _timers(self) -> AsyncLoop:
+        if self._loop is None:
+            self._loop = get_async_loop()
+        return self._loop
+
+    def _stream_version(self, stream: typing.Tuple[bool, typing.Any]) -> int:
+        # A stream is read back once and then tracked here; a write committed meanwhile by
+        # another connection trips the unique stream index when the buffer is flushed.
+        version = self._versions.get(stream)
+        if version is None:
+            is_aggregate, key = stream
+            if is_aggregate:
+                query = 'SELECT MAX(version) FROM events WHERE aggregate_id = ?'
+            else:
+                query = 'SELECT MAX(version) FROM events WHERE type = ? AND aggregate_id IS NULL'
+            version = self._versions[stream] = self._connection.execute(query, (key,)).fetchone()[0] or 0
+        return version
+
+    def _restore_versions(self, buffer: typing.List[typing.Tuple]) -> None:
+        # Events stored before this store was opened are only recognised here, once per flush:
+        # the row keeps its stored version, and the streams they bumped are read back again.
+        uuids = [row[0] for row in buffer]
+        stored = {}
+        for offset in range(0, len(uuids), 500):
+            chunk = uuids[offset:offset + 500]
+            query = f'SELECT uuid, version FROM events WHERE uuid IN ({", ".join("?" * len(chunk))})'
+            stored.update(self._connection.execute(query, chunk).fetchall())
+
+        for uuid, version in stored.items():
+            if self._stored.get(uuid) != version:
+                self._stored[uuid] = version
+                self._versions.clear()
+
+    def _insert_each(self, buffer: typing.List[typing.Tuple]) -> None:
+        conflict = None
+        for row in buffer:
+            try:
+                with self._connection:
+                    self._connection.execute(_INSERT, row)
+            except sqlite3.IntegrityError:
+                self._stored.pop(row[0], None)
+                if conflict is None:
+                    conflict = row
+
+        if conflict is not None:
+            self._versions.clear()
+            _, _, aggregate_id, version, _, _ = conflict
+            raise ConcurrencyError(aggregate_id, self.get_version(aggregate_id), version - 1)
+
+    def _query(self, query: str, *parameters) -> typing.Iterator[Event]:
+        with self._lock:
+            self.flush()
+            cursor = self._connection.execute(query, parameters)
+
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(self._batch_size)
+            if not rows:
+                return
+            for payload, version in rows:
+                event = pickle.loads(payload)
+                event.version = version
+                yield event
@@ -0,0 +1,173 @@
+import asyncio
+import functools
+import threading
+import typing
+
+from corx.dispatcher import Dispatcher, get_dispatcher
+from corx.event import AnyEvent, Event, EventType
+
+__all__ = [
+    'Subscription',
+]
+
+_CLOSED = object()
+
+
+async def _call(function: typing.Callable, *args) -> typing.Any:
+    return function(*args)
+
+
+class Subscription():
+    def __init__(self,
+                 store: typing.Any,
+                 start: int = 0,
+                 events: typing.Tuple[EventType, ...] = (Event,),
+                 batch_size: int = 512,
+                 dispatcher: typing.Optional[Dispatcher] = None):
+        self._store = store
+        self._position = start
+        self._events = events
+        self._batch_size = batch_size
+        self._dispatcher = dispatcher
+        self._buffer: typing.Dict[int, Event] = {}
+        self._replayed: typing.Optional[typing.Set[int]] = None
+        self._lock = threading.Lock()
+        self._target: typing.Optional[typing.Callable[[Event], typing.Any]] = None
+        self._wake: typing.Optional[typing.Callable[[typing.Any], typing.Any]] = None
+        self._registered = False
+        self._open = False
+
+    @property
+    def position(self) -> int:
+        return self._position
+
+    @property
+    def is_live(self) -> bool:
+        return self._target is not None
+
+    def start(self, handler: typing.Callable[[Event], typing.Any]) -> 'Subscription':
+        self._subscribe()
+        for event in self._history():
+            handler(event)
+
+        for event in self._hand_off(handler):
+            handler(event)
+        return self
+
+    def stop(self) -> None:
+        if not self._open:
+            return
+
+        self._on_loop(self._dispatcher.deactivate, self._receive)
+        with self._lock:
+            self._buffer.clear()
+            self._replayed = None
+            self._target = None
+        self._open = False
+        if self._wake is not None:
+            self._wake(_CLOSED)
+            self._wake = None
+
+    async def __aiter__(self) -> typing.AsyncIterator[Event]:
+        self._subscribe()
+        try:
+            for count, event in enumerate(self._history(), 1):
+                yield event
+                if count % self._batch_size == 0:
+                    await asyncio.sleep(0)
+
+            # Live events arrive on the dispatcher's loop, which may run in another thread.
+            queue = asyncio.Queue()
+            self._wake = functools.partial(asyncio.get_running_loop().call_soon_threadsafe, queue.put_nowait)
+            for event in self._hand_off(self._wake):
+                yield event
+
+            while True:
+                event = await queue.get()
+                if event is _CLOSED:
+                    return
+                yield event
+        finally:
+            self.stop()
+
+    def _subscribe(self) -> None:
+        if self._open:
+            raise Exception('Subscription is already open.')
+
+        self._dispatcher = self._dispatcher or get_dispatcher()
+        loop = self._dispatcher.loop
+        if loop.is_foreign_thread():
+            # With the loop in its own thread, the store can record an event before it is
+            # received here, so replayed ids are kept until the hand-off to drop it then.
+            self._replayed = set()
+            loop.submit(self._settle).result()
+        else:
+            self._replayed = None
+            self._listen()
+        self._open = True
+
+    def _listen(self) -> None:
+        if self._registered:
+            self._dispatcher.activate(self._receive)
+        else:
+            self._dispatcher.register(AnyEvent, self._receive)
+            self._registered = True
+
+    async def _settle(self) -> None:
+        # Listener plans are rebuilt on the loop thread, and events fanned out before the
+        # listener was added may still be on their way to the store.
+        self._listen()
+        await self._dispatcher.loop.join()
+
+    def _on_loop(self, function: typing.Callable, *args) -> None:
+        loop = self._dispatcher.loop
+        if loop.is_foreign_thread():
+            loop.submit(_call, function, *args).result()
+        else:
+            function(*args)
+
+    def _history(self) -> typing.Iterator[Event]:
+        # Live events seen while catching up are parked by id; any that show up in the
+        # store are dropped from the buffer so they are delivered exactly once.
+        lock, events = self._lock, self._events
+        for event in self._store.replay(self._position):
+            self._position += 1
+            with lock:
+                if self._buffer.pop(event._id, None) is None and self._replayed is not None:
+                    self._replayed.add(event._id)
+            if isinstance(event, events):
+                yield event
+
+    def _hand_off(self, target: typing.Callable[[Event], typing.Any]) -> typing.Iterator[Event]:
+        while True:
+            with self._lock:
+                pending, self._buffer = self._buffer, {}
+                if not pending:
+                    self._replayed = None
+                    self._target = target
+                    return
+
+            for event in pending.values():
+                self._position += 1
+                if isinstance(event, self._events):
+                    yield event
+
+    def _receive(self, event: Event) -> None:
+        # Positions count bus events, so they match store offsets only while the store
+        # records every event dispatched on this bus.
+        with self._lock:
+            target = self._target
+            if target is None:
+                if self._replayed is None or event._id not in self._replayed:
+                    self._buffer[event._id] = event
+                return
+
+        self._position += 1
+        if isinstance(event, self._events):
+            target(event)
+
+    def __enter__(self) -> 'Subscription':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -1,4 +1,5 @@
 import abc
+import dataclasses
 import typing
 import unittest
 
@@ -22,10 +23,16 @@ class UnitTestCase(unittest.TestCase, abc.ABC):
     @classmethod
     def setUpClass(cls):
         cls.dispatcher = corx.dispatcher.get_dispatcher()
-        cls._event_store = corx.event.reacts(corx.event.AnyEvent)(corx.event.RuntimeEventStore)()
+        cls._event_store = corx.event.reacts(corx.event.AnyEvent)(corx.event.RuntimeEventStore())
 
         cls.dispatcher.propagate_exceptions(True)
 
+    @classmethod
+    def tearDownClass(cls):
+        # The first store to append an event numbers it, so a finished class must not keep
+        # recording the events of the next one.
+        cls.dispatcher.deactivate(cls._event_store)
+
     def tearDown(self):
         self._event_store.clear()
 
@@ -45,12 +52,11 @@ class UnitTestCase(unittest.TestCase, abc.ABC):
             if isinstance(expected, type):
                 self.assertIsInstance(actual, expected, 'Event type mismatch.')
             elif isinstance(expected, corx.event.Event):
-                excepted_data = expected.__dict__.copy()
-                actual_data = actual.__dict__.copy()
+                fields = [field.name for field in dataclasses.fields(expected)]
+                if strict:
+                    fields += EVENT_BUILTINS
 
-                if not strict:
-                    for builtin in EVENT_BUILTINS:
-                        excepted_data.pop(builtin)
-                        actual_data.pop(builtin)
+                excepted_data = {field: getattr(expected, field) for field in fields}
+                actual_data = {field: getattr(actual, field, None) for field in fields}
 
                 self.assertDictEqual(excepted_data, actual_data, 'Excepted Event data mismatch')
@@ -23,7 +23,8 @@ class CommandFactory(object):
 
     @staticmethod
     def register_command_handler(command: typing.Type[corx.command.Command],
-                                 cb: HandlerClosure) -> None:
+                                 cb: HandlerClosure,
+                                 execution: corx.dispatcher.Execution = corx.dispatcher.Execution.INLINE) -> None:
         handler_cls = type(
             command.__name__ + 'Handler',
             (corx.command.CommandHandler,),
@@ -33,7 +34,7 @@ class CommandFactory(object):
             }
         )
 
-        corx.command.handles(command)(handler_cls)
+        corx.command.handles(command, execution)(handler_cls)
 
 
 class EventFactory(object):
@@ -0,0 +1,82 @@
+import dataclasses
+import typing
+import unittest
+
+import corx
+from corx.codec import Codec, TypeRegistry
+
+
+@dataclasses.dataclass
+class EncodedCommand(corx.command.Command):
+    count: int
+    ratio: float
+    enabled: bool
+    name: str
+    note: typing.Optional[str]
+    tags: typing.List[str]
+
+
+@dataclasses.dataclass
+class EncodedEvent(corx.event.Event):
+    aggregate_id: str
+    payload: memoryview
+    raw: bytes
+    amount: typing.Optional[int] = None
+
+    def apply(self, aggregate):
+        ...
+
+
+class TestCodec(unittest.TestCase):
+    def setUp(self):
+        self.codec = Codec(TypeRegistry())
+
+    def test_command_round_trip(self):
+        command = EncodedCommand(count=3, ratio=0.5, enabled=True, name='ping', note=None, tags=['a', 'b'])
+
+        decoded = self.codec.decode(self.codec.encode(command))
+
+        self.assertEqual(command, decoded)
+        self.assertEqual((command.uuid, command.timestamp), (decoded.uuid, decoded.timestamp))
+
+    def test_event_round_trip_without_copying_payload(self):
+        event = EncodedEvent(aggregate_id='a', payload=memoryview(b'payload'), raw=b'raw', amount=7)
+        event.version = 4
+
+        buffer = bytearray(self.codec.encode(event))
+        decoded = self.codec.decode(buffer)
+
+        self.assertEqual((event.uuid, 4, 'a', b'raw', 7), (decoded.uuid, decoded.version, decoded.aggregate_id, decoded.raw, decoded.amount))
+        self.assertEqual(b'payload', decoded.payload.tobytes())
+        self.assertIs(buffer, decoded.payload.obj)
+
+    def test_batch_round_trip(self):
+        messages = [
+            EncodedEvent(aggregate_id=str(index), payload=memoryview(b''), raw=b'') if index % 2 else
+            EncodedCommand(count=index, ratio=0.0, enabled=False, name='', note='n', tags=[])
+            for index in range(10)
+        ]
+
+        decoded = self.codec.decode_many(self.codec.encode_many(messages))
+
+        self.assertEqual([message.uuid for message in messages], [message.uuid for message in decoded])
+        self.assertEqual([type(message) for message in messages], [type(message) for message in decoded])
+
+    def test_unknown_type_ids_are_discovered(self):
+        encoded = self.codec.encode(EncodedCommand(count=1, ratio=1.0, enabled=True, name='x', note=None, tags=[]))
+
+        self.assertEqual(1, Codec(TypeRegistry()).decode(encoded).count)
+
+    def test_registry_rejects_conflicting_ids(self):
+        registry = TypeRegistry()
+        registry.register(EncodedCommand, 1)
+
+        with self.assertRaises(Exception):
+            registry.register(EncodedEvent, 1)
+
+        with self.assertRaises(Exception):
+            registry.register(EncodedCommand, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
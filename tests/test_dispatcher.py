@@ -1,11 +1,34 @@
 import asyncio
+import dataclasses
+import subprocess
+import sys
+import threading
 import time
 import unittest
 
 import corx
+from corx.dispatcher import Execution
 from .factory import CommandFactory, EventFactory
 
 
+@dataclasses.dataclass
+class SquareCommand(corx.command.Command):
+    value: int
+
+
+@dataclasses.dataclass
+class SquaredEvent(corx.event.Event):
+    value: int
+
+    def apply(self, aggregate):
+        ...
+
+
+@corx.command.handles(SquareCommand, execution=Execution.PROCESS)
+def square(command: SquareCommand):
+    return SquaredEvent(value=command.value ** 2)
+
+
 class TestDispatcher(corx.test.UnitTestCase):
     def test_sync_dispatch(self):
         command = CommandFactory.create_command('DispatchCommand', ['duration'])
@@ -22,6 +45,27 @@ class TestDispatcher(corx.test.UnitTestCase):
 
         self.assertAlmostEqual(0.2, time.time() - start, 1)
 
+    def test_threaded_sync_dispatch(self):
+        command = CommandFactory.create_command('DispatchCommand', ['duration'])
+        event = EventFactory.create_event('EmittedEvent')
+
+        def handle(self_, command_):
+            time.sleep(command_.duration)
+            event.dispatch()
+
+        CommandFactory.register_command_handler(command, handle, Execution.THREAD)
+
+        start = time.time()
+        self.when(command(duration=0.1), command(duration=0.1))
+
+        self.assertAlmostEqual(0.1, time.time() - start, 1)
+        self.then(event, event)
+
+    def test_process_pool_results_join_cascade(self):
+        self.when(SquareCommand(value=2))
+
+        self.then(SquaredEvent(value=4))
+
     def test_async_dispatch(self):
         command = CommandFactory.create_command('DispatchCommand', ['duration'])
 
@@ -68,6 +112,306 @@ class TestDispatcher(corx.test.UnitTestCase):
         self.assertEqual(1, last_given_event.version)
         self.assertEqual(2, last_emitted_event.version)
 
+    def test_dispatch_through_deep_hierarchy(self):
+        base_command = CommandFactory.create_command('BaseCommand')
+
+        class Mixin:
+            ...
+
+        class DerivedCommand(Mixin, base_command):
+            ...
+
+        event = EventFactory.create_event('EmittedEvent')
+
+        def handle(self_, command_):
+            event.dispatch()
+
+        CommandFactory.register_command_handler(DerivedCommand, handle)
+
+        self.when(DerivedCommand())
+
+        self.then(event)
+
+    def test_route_is_cached_per_class(self):
+        command = CommandFactory.create_command('DispatchCommand')
+
+        CommandFactory.register_command_handler(command, lambda self_, command_: None)
+        self.when(command())
+
+        executor = self.dispatcher._routes[command]
+        self.assertIs(executor, self.dispatcher._resolve(command))
+        self.assertIsInstance(executor, corx.command.CommandExecutor)
+
+    def test_dispatch_async_inside_running_loop(self):
+        command = CommandFactory.create_command('DispatchCommand', ['duration'])
+        event = EventFactory.create_event('EmittedEvent')
+
+        async def handle(self_, command_):
+            await asyncio.sleep(command_.duration)
+            event.dispatch()
+
+        CommandFactory.register_command_handler(command, handle)
+
+        async def serve():
+            await self.dispatcher.dispatch_async(command(duration=0.1), command(duration=0.1))
+            self.then(event, event)
+
+        start = time.time()
+        asyncio.run(serve())
+
+        self.assertAlmostEqual(0.1, time.time() - start, 1)
+
+    def test_dispatch_nowait_inside_running_loop(self):
+        command = CommandFactory.create_command('DispatchCommand')
+        event = EventFactory.create_event('EmittedEvent')
+
+        async def handle(self_, command_):
+            await event.dispatch_async()
+
+        CommandFactory.register_command_handler(command, handle)
+
+        async def serve():
+            self.dispatcher.dispatch_nowait(command())
+            self.then()
+
+            await asyncio.sleep(0.01)
+            self.then(event)
+
+        asyncio.run(serve())
+
+    def test_handles_resolve_with_handler_results(self):
+        command = CommandFactory.create_command('ResultCommand', ['value'])
+
+        async def handle(self_, command_):
+            await asyncio.sleep(0.01)
+            return command_.value * 2
+
+        CommandFactory.register_command_handler(command, handle)
+
+        handles = [self.dispatcher.submit(command(value=value)) for value in range(3)]
+
+        self.assertFalse(handles[0].done())
+        self.assertEqual([0, 2, 4], [handle.result() for handle in handles])
+
+    def test_handles_carry_handler_exceptions(self):
+        command = CommandFactory.create_command('FailingCommand')
+
+        async def handle(self_, command_):
+            raise ValueError('failed')
+
+        CommandFactory.register_command_handler(command, handle)
+
+        handle = command.submit()
+
+        self.assertIsInstance(handle.exception(), ValueError)
+        with self.assertRaises(ValueError):
+            handle.result()
+        self.assertEqual([], self.dispatcher.drain_exceptions())
+
+    def test_gather_inside_running_loop(self):
+        command = CommandFactory.create_command('GatheredCommand', ['value'])
+        event = EventFactory.create_event('GatheredEvent')
+
+        async def handle(self_, command_):
+            await asyncio.sleep(0.05)
+            return command_.value
+
+        CommandFactory.register_command_handler(command, handle)
+        corx.event.reacts(event)(lambda event_: 'reacted')
+
+        async def serve():
+            single = await self.dispatcher.submit(command(value=1))
+            gathered = await self.dispatcher.gather(*[command(value=value) for value in range(4)])
+            reactions = await self.dispatcher.submit(event())
+            return single, gathered, reactions
+
+        start = time.time()
+        single, gathered, reactions = asyncio.run(serve())
+
+        self.assertAlmostEqual(0.1, time.time() - start, 1)
+        self.assertEqual(1, single)
+        self.assertEqual([0, 1, 2, 3], gathered)
+        self.assertEqual('reacted', reactions[0])
+
+    def test_handles_from_foreign_threads(self):
+        command = CommandFactory.create_command('ThreadedResultCommand', ['value'])
+
+        async def handle(self_, command_):
+            await asyncio.sleep(0.01)
+            return command_.value
+
+        CommandFactory.register_command_handler(command, handle)
+        self.dispatcher.start_thread()
+        try:
+            handles = [self.dispatcher.submit(command(value=value)) for value in range(10)]
+            results = corx.dispatcher.gather(*handles).result(1)
+        finally:
+            self.dispatcher.stop_thread()
+
+        self.assertEqual(list(range(10)), results)
+
+    def test_failed_handlers_are_retried_without_holding_a_worker(self):
+        command = CommandFactory.create_command('FlakyCommand', ['name'])
+        log = []
+
+        @corx.command.handles(command, retry=corx.dispatcher.RetryPolicy(max_attempts=3, backoff=0.05, jitter=0))
+        async def handle(command_):
+            log.append(command_.name)
+            if command_.name == 'flaky' and log.count('flaky') < 3:
+                raise ValueError('flaky')
+
+        self.dispatcher.configure_loop(max_workers=1)
+        try:
+            start = time.time()
+            self.when(command(name='flaky'), command(name='steady'))
+        finally:
+            self.dispatcher.configure_loop()
+
+        self.assertAlmostEqual(0.15, time.time() - start, 1)
+        self.assertEqual(['flaky', 'steady', 'flaky', 'flaky'], log)
+        self.assertEqual(0, len(self.dispatcher.dead_letters))
+
+    def test_retries_keep_their_place_in_ordered_lanes(self):
+        event = EventFactory.create_event('OrderedFlakyEvent', ['key', 'n'])
+
+        class OrderedFlakyEvent(event):
+            ordered_by = 'key'
+
+        handled, failed = [], []
+
+        async def react(event_):
+            if event_.n == 0 and not failed:
+                failed.append(event_.n)
+                raise ValueError('flaky')
+            handled.append(event_.n)
+
+        corx.event.reacts(OrderedFlakyEvent, retry=corx.dispatcher.RetryPolicy(max_attempts=3, backoff=0.02))(react)
+        self.dispatcher.dispatch(*[OrderedFlakyEvent(key='a', n=n) for n in range(3)])
+
+        self.assertEqual([0, 1, 2], handled)
+        self.assertEqual(0, len(self.dispatcher.dead_letters))
+
+    def test_exhausted_retries_are_dead_lettered_and_replayed(self):
+        command = CommandFactory.create_command('BrokenCommand', ['value'])
+        healthy = []
+
+        @corx.command.handles(command, retry=corx.dispatcher.RetryPolicy(max_attempts=2, backoff=0.01))
+        async def handle(command_):
+            if not healthy:
+                raise ValueError(command_.value)
+            healthy.append(command_.value)
+            return command_.value
+
+        self.dispatcher.dead_letters.clear()
+        handle_ = self.dispatcher.submit(command(value=1))
+
+        self.assertIsInstance(handle_.exception(), ValueError)
+        letters = list(self.dispatcher.dead_letters)
+        self.assertEqual(1, len(letters))
+        self.assertEqual(2, letters[0].attempts)
+        self.assertEqual(command(value=1), letters[0].dispatchable)
+
+        healthy.append(None)
+        self.assertEqual(1, self.dispatcher.replay_dead_letters())
+
+        self.assertEqual([None, 1], healthy)
+        self.assertEqual(0, len(self.dispatcher.dead_letters))
+
+    def test_dead_letters_replay_on_the_loop_thread(self):
+        command = CommandFactory.create_command('ThreadedBrokenCommand')
+        healthy = []
+
+        @corx.command.handles(command, retry=corx.dispatcher.RetryPolicy(max_attempts=1))
+        async def handle(command_):
+            if not healthy:
+                raise ValueError('broken')
+            healthy.append(threading.current_thread().name)
+
+        self.dispatcher.dead_letters.clear()
+        self.dispatcher.start_thread()
+        try:
+            self.assertIsInstance(self.dispatcher.submit(command()).exception(1), ValueError)
+
+            healthy.append(None)
+            self.assertEqual(1, self.dispatcher.replay_dead_letters())
+        finally:
+            self.dispatcher.stop_thread(1)
+
+        self.assertEqual([None, 'corx-loop'], healthy)
+        self.assertFalse(self.dispatcher.loop.is_running())
+
+    def test_dead_letter_queue_is_bounded(self):
+        dead_letters = corx.dispatcher.DeadLetterQueue(max_size=2)
+        dispatcher = corx.dispatcher.Dispatcher(dead_letters=dead_letters)
+        dispatcher.propagate_exceptions(False)
+        event = EventFactory.create_event('PoisonEvent', ['index'])
+
+        def react(event_):
+            raise ValueError(event_.index)
+
+        corx.event.reacts(event, dispatcher=dispatcher, retry=corx.dispatcher.RetryPolicy(max_attempts=1))(react)
+        for index in range(5):
+            dispatcher.submit(event(index=index))
+
+        self.assertEqual([3, 4], [letter.dispatchable.index for letter in dead_letters])
+        self.assertEqual(3, dead_letters.dropped)
+        self.assertEqual([4], [letter.dispatchable.index for letter in dead_letters.take(lambda letter: letter.dispatchable.index == 4)])
+        self.assertEqual(1, len(dead_letters))
+
+
+class TestIsolatedDispatcher(unittest.TestCase):
+    def test_dispatchers_keep_separate_registries(self):
+        command = CommandFactory.create_command('IsolatedCommand')
+        event = EventFactory.create_event('IsolatedEvent')
+        first, second = corx.dispatcher.Dispatcher(), corx.dispatcher.Dispatcher()
+        received = []
+
+        @corx.command.handles(command, dispatcher=first)
+        def handle(command_):
+            first.dispatch(event())
+
+        corx.event.reacts(event, dispatcher=first)(lambda event_: received.append('first'))
+        corx.event.reacts(event, dispatcher=second)(lambda event_: received.append('second'))
+
+        first.dispatch(command())
+        second.dispatch(event())
+
+        self.assertEqual(['first', 'second'], received)
+        self.assertIsNot(first.loop, second.loop)
+        with self.assertRaises(Exception):
+            second.dispatch(command())
+
+    def test_handlers_dispatch_to_their_own_dispatcher(self):
+        command = CommandFactory.create_command('IsolatedCommand')
+        inline = EventFactory.create_event('InlineEvent')
+        awaited = EventFactory.create_event('AwaitedEvent')
+        isolated = corx.dispatcher.Dispatcher()
+        received = []
+
+        @corx.command.handles(command, dispatcher=isolated)
+        def handle(command_):
+            inline.dispatch()
+
+        @corx.event.reacts(inline, dispatcher=isolated)
+        async def react(event_):
+            await asyncio.sleep(0)
+            corx.dispatcher.dispatch(awaited())
+
+        corx.event.reacts(awaited, dispatcher=isolated)(lambda event_: received.append('isolated'))
+        leaked = corx.event.reacts(awaited)(lambda event_: received.append('global'))
+        try:
+            isolated.dispatch(command())
+        finally:
+            corx.dispatcher.get_dispatcher().deactivate(leaked)
+
+        self.assertEqual(['isolated'], received)
+
+    def test_import_is_lazy(self):
+        script = 'import sys, corx; print(sorted({"unittest", "corx.test", "corx.dispatcher"} & set(sys.modules)))'
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+
+        self.assertEqual('[]', output.strip())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,275 @@
+import asyncio
+import dataclasses
+import pickle
+import time
+import unittest
+import uuid
+
+import corx
+from corx.loop import HandlerTimeout
+from .factory import EventFactory
+
+
+@dataclasses.dataclass
+class PickledEvent(corx.event.Event):
+    value: int
+
+    def apply(self, aggregate):
+        ...
+
+
+class TestEvent(unittest.TestCase):
+    def test_builtins_are_assigned_per_instance(self):
+        event = EventFactory.create_event('BuiltinEvent')
+
+        first = event()
+        time.sleep(0.001)
+        second = event()
+
+        self.assertLess(first.timestamp, second.timestamp)
+        self.assertLess(first.sequence, second.sequence)
+        self.assertNotEqual(first.uuid, second.uuid)
+        self.assertEqual(first.uuid, first.uuid)
+        self.assertEqual({}, first.__dict__)
+
+    def test_uuid_is_rfc_4122(self):
+        parsed = uuid.UUID(EventFactory.create_event('UuidEvent')().uuid)
+
+        self.assertEqual((4, uuid.RFC_4122), (parsed.version, parsed.variant))
+
+    def test_builtins_survive_pickling(self):
+        original = PickledEvent(value=1)
+        original.version = 3
+
+        restored = pickle.loads(pickle.dumps(original))
+
+        self.assertEqual((original.uuid, original.timestamp, original.version, 1),
+                         (restored.uuid, restored.timestamp, restored.version, restored.value))
+
+
+class TestRuntimeEventStore(unittest.TestCase):
+    def setUp(self):
+        self.store = corx.event.RuntimeEventStore()
+
+    def test_reads_follow_append_order(self):
+        first_event = EventFactory.create_event('FirstEvent')
+        second_event = EventFactory.create_event('SecondEvent')
+
+        events = [second_event(), first_event(), second_event()]
+        self.store.seed_events(*events)
+
+        self.assertEqual([event.uuid for event in events], [event.uuid for event in self.store.get()])
+        self.assertEqual([events[0].uuid, events[2].uuid], [event.uuid for event in self.store.get_by_type(second_event)])
+        self.assertEqual([], self.store.get_by_type(EventFactory.create_event('OtherEvent')))
+
+    def test_latest_by_type(self):
+        event = EventFactory.create_event('VersionedEvent')
+
+        events = [event(), event(), event()]
+        self.store.seed_events(*events)
+
+        self.assertEqual(events[-1].uuid, self.store.get_latest_by_type(event).uuid)
+        self.assertEqual([1, 2, 3], [event.version for event in self.store.get()])
+
+        with self.assertRaises(Exception):
+            self.store.get_latest_by_type(EventFactory.create_event('OtherEvent'))
+
+    def test_reseeding_replaces_event(self):
+        event = EventFactory.create_event('SeededEvent')
+
+        seeded = event()
+        self.store.seed_events(seeded, seeded)
+
+        latest = self.store.get_latest_by_type(event)
+        self.assertEqual(1, len(self.store))
+        self.assertEqual((seeded.uuid, 1), (latest.uuid, latest.version))
+
+    def test_aggregate_index(self):
+        event = EventFactory.create_event('AggregateEvent', ['aggregate_id'])
+
+        events = [event(aggregate_id=1), event(aggregate_id=2), event(aggregate_id=1)]
+        self.store.seed_events(*events)
+
+        self.assertEqual([events[0].uuid, events[2].uuid], [event_.uuid for event_ in self.store.get_by_aggregate(1)])
+        self.assertEqual([], self.store.get_by_aggregate(3))
+
+    def test_versions_are_assigned_per_stream(self):
+        event = EventFactory.create_event('StreamEvent', ['aggregate_id'])
+
+        events = [event(aggregate_id='a'), event(aggregate_id='b'), event(aggregate_id='a')]
+        self.store.seed_events(*events)
+
+        self.assertEqual([1, 1, 2], [event.version for event in self.store.get()])
+        self.assertEqual(2, self.store.get_version('a'))
+
+    def test_versions_are_kept_per_store(self):
+        event = EventFactory.create_event('SharedEvent', ['aggregate_id'])
+        other = corx.event.RuntimeEventStore()
+        other.seed_events(event(aggregate_id='a'))
+
+        shared = event(aggregate_id='a')
+        self.store.seed_events(shared)
+        other.seed_events(shared)
+
+        self.assertEqual(1, shared.version)
+        self.assertEqual(1, self.store.get_latest_by_type(event).version)
+        self.assertEqual(2, other.get_latest_by_type(event).version)
+
+    def test_expected_version_conflict(self):
+        event = EventFactory.create_event('StreamEvent', ['aggregate_id'])
+
+        self.store.append(event(aggregate_id='a'), expected_version=0)
+        self.store.seed_events(event(aggregate_id='a').expect(1))
+
+        with self.assertRaises(corx.event.ConcurrencyError):
+            self.store.append(event(aggregate_id='a'), expected_version=1)
+
+        self.assertEqual(2, self.store.get_version('a'))
+
+
+class TestEventExecutor(corx.test.UnitTestCase):
+    def test_listeners_of_base_classes_receive_events(self):
+        base = EventFactory.create_event('BaseEvent')
+        derived = dataclasses.make_dataclass('DerivedEvent', [], bases=(base,))
+        received = []
+
+        @corx.event.reacts(base)
+        async def react_base(event_):
+            received.append(('base', type(event_)))
+
+        @corx.event.reacts(derived)
+        async def react_derived(event_):
+            received.append(('derived', type(event_)))
+
+        self.dispatcher.dispatch(derived(), base())
+
+        self.assertEqual([('derived', derived), ('base', derived), ('base', base)], received)
+
+    def test_listener_classes_are_instantiated_once(self):
+        event = EventFactory.create_event('CountedEvent')
+        instances = []
+
+        @corx.event.reacts(event)
+        class Listener(corx.event.EventListener):
+            def __init__(self):
+                instances.append(self)
+
+            async def react(self, event_):
+                ...
+
+        self.dispatcher.dispatch(event(), event(), event())
+
+        self.assertEqual(1, len(instances))
+
+    def test_plans_follow_activation(self):
+        event = EventFactory.create_event('ToggledEvent')
+        received = []
+
+        async def listener(event_):
+            received.append(event_)
+
+        corx.event.reacts(event)(listener)
+        self.dispatcher.dispatch(event())
+        self.dispatcher.deactivate(listener)
+        self.dispatcher.dispatch(event())
+        self.dispatcher.activate(listener)
+        self.dispatcher.dispatch(event())
+
+        self.assertEqual(2, len(received))
+
+    def test_listeners_see_the_stored_version(self):
+        event = EventFactory.create_event('NumberedEvent', ['aggregate_id'])
+        versions = []
+
+        @corx.event.reacts(event)
+        def listener(event_):
+            versions.append(event_.version)
+
+        self.dispatcher.dispatch(event(aggregate_id='a'), event(aggregate_id='b'), event(aggregate_id='a'))
+
+        self.assertEqual([1, 1, 2], versions)
+
+    def test_rejected_appends_are_not_fanned_out(self):
+        event = EventFactory.create_event('RejectedEvent', ['aggregate_id'])
+        received = []
+
+        @corx.event.reacts(event)
+        def listener(event_):
+            received.append(event_)
+
+        with self.assertRaises(corx.event.ConcurrencyError):
+            self.dispatcher.dispatch(event(aggregate_id='a').expect(1))
+        handle = self.dispatcher.submit(event(aggregate_id='a').expect(1))
+
+        self.assertIsInstance(handle.exception(), corx.event.ConcurrencyError)
+        self.assertEqual([], received)
+        self.assertEqual(0, len(self._event_store))
+
+    def test_batch_listeners_flush_before_processing_returns(self):
+        event = EventFactory.create_event('BatchedEvent', ['index'])
+        batches = []
+
+        @corx.event.reacts(event)
+        class Sink(corx.event.BatchListener):
+            max_batch_size = 100
+
+            def react_batch(self, events):
+                batches.append([event_.index for event_ in events])
+
+        self.dispatcher.dispatch(*[event(index=index) for index in range(250)])
+
+        self.assertEqual([100, 100, 50], [len(batch) for batch in batches])
+        self.assertEqual(list(range(250)), [index for batch in batches for index in batch])
+
+    def test_batch_listeners_flush_after_linger(self):
+        event = EventFactory.create_event('LingeringEvent')
+        batches = []
+
+        @corx.event.reacts(event)
+        class Sink(corx.event.BatchListener):
+            max_linger = 0.02
+
+            async def react_batch(self, events):
+                await asyncio.sleep(0)
+                batches.append(len(events))
+
+        async def serve():
+            for _ in range(3):
+                self.dispatcher.dispatch_nowait(event())
+            self.assertEqual([], batches)
+
+            await asyncio.sleep(0.05)
+            self.assertEqual([3], batches)
+
+        asyncio.run(serve())
+
+
+    def test_batch_listeners_follow_their_retry_and_timeout(self):
+        flaky = EventFactory.create_event('FlakyBatchedEvent')
+        slow = EventFactory.create_event('SlowBatchedEvent')
+        attempts = []
+
+        @corx.event.reacts(flaky, retry=corx.dispatcher.RetryPolicy(max_attempts=2, backoff=0.01, jitter=0))
+        class FlakySink(corx.event.BatchListener):
+            max_batch_size = 3
+
+            def react_batch(self, events):
+                attempts.append(len(events))
+                if len(attempts) == 1:
+                    raise ValueError('flaky')
+
+        @corx.event.reacts(slow, timeout=0.01)
+        class SlowSink(corx.event.BatchListener):
+            max_batch_size = 1
+
+            async def react_batch(self, events):
+                await asyncio.sleep(1)
+
+        self.dispatcher.dispatch(flaky(), flaky(), flaky())
+        with self.assertRaises(HandlerTimeout):
+            self.dispatcher.dispatch(slow())
+
+        self.assertEqual([3, 3], attempts)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,381 @@
+import asyncio
+import concurrent.futures
+import inspect
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import unittest
+
+import corx
+from corx.loop import Backpressure, DeadlineExceeded, HandlerTimeout, get_async_loop
+from .factory import CommandFactory, EventFactory
+
+
+class TestAsyncLoop(corx.test.UnitTestCase):
+    def tearDown(self):
+        super().tearDown()
+        self.dispatcher.configure_loop()
+
+    def test_cancelled_workers_tear_down_with_their_loop(self):
+        script = textwrap.dedent('''
+            import asyncio, dataclasses, corx
+
+            @dataclasses.dataclass
+            class SlowCommand(corx.command.Command):
+                index: int
+
+            @corx.command.handles(SlowCommand)
+            async def handle(command):
+                await asyncio.sleep(0.01)
+
+            async def serve():
+                dispatcher = corx.dispatcher.get_dispatcher()
+                await dispatcher.dispatch_async(*[SlowCommand(index=index) for index in range(100)])
+                dispatcher.dispatch_nowait(*[SlowCommand(index=index) for index in range(100)])
+                raise ValueError
+
+            try:
+                asyncio.run(serve())
+            except ValueError:
+                print(corx.dispatcher.get_dispatcher().loop.stats()['pending'])
+        ''')
+        completed = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=10)
+
+        self.assertEqual('0', completed.stdout.strip(), completed.stderr)
+        self.assertNotIn('never awaited', completed.stderr)
+        self.assertNotIn('destroyed but it is pending', completed.stderr)
+
+    def test_worker_count_is_bounded(self):
+        command = CommandFactory.create_command('DispatchCommand')
+        worker_counts = []
+
+        async def handle(self_, command_):
+            worker_counts.append(get_async_loop().worker_count())
+            await asyncio.sleep(0.05)
+
+        CommandFactory.register_command_handler(command, handle)
+        self.dispatcher.configure_loop(max_workers=2)
+
+        start = time.time()
+        self.when(*[command() for _ in range(6)])
+
+        self.assertLessEqual(max(worker_counts), 2)
+        self.assertAlmostEqual(0.15, time.time() - start, 1)
+
+    def test_full_queue_rejects(self):
+        command = CommandFactory.create_command('DispatchCommand')
+        event = EventFactory.create_event('EmittedEvent')
+
+        async def handle(self_, command_):
+            event.dispatch()
+
+        CommandFactory.register_command_handler(command, handle)
+        self.dispatcher.configure_loop(max_queue_size=2, backpressure=Backpressure.REJECT)
+
+        with self.assertRaises(asyncio.QueueFull):
+            self.when(command(), command(), command())
+
+        self.when()
+        self.then(event, event)
+
+    def test_full_queue_blocks(self):
+        command = CommandFactory.create_command('DispatchCommand')
+        event = EventFactory.create_event('EmittedEvent')
+
+        async def handle(self_, command_):
+            event.dispatch()
+
+        CommandFactory.register_command_handler(command, handle)
+        self.dispatcher.configure_loop(max_queue_size=2)
+
+        self.when(*[command() for _ in range(5)])
+        self.then(*[event] * 5)
+
+    def test_queue_bound_holds_per_item(self):
+        command = CommandFactory.create_command('DispatchCommand')
+        depths = []
+
+        async def handle(self_, command_):
+            depths.append(get_async_loop().stats()['queue_depth'])
+            await asyncio.sleep(0)
+
+        CommandFactory.register_command_handler(command, handle)
+        self.dispatcher.configure_loop(max_queue_size=2)
+
+        async def serve():
+            await self.dispatcher.dispatch_async(*[command() for _ in range(100)])
+            self.assertEqual(100, len(depths))
+            self.assertLessEqual(max(depths), 2)
+
+            self.dispatcher.configure_loop(max_queue_size=2, backpressure=Backpressure.REJECT)
+            with self.assertRaises(asyncio.QueueFull):
+                self.dispatcher.dispatch_nowait(*[command() for _ in range(100)])
+            await self.dispatcher.loop.join()
+            self.assertEqual(102, len(depths))
+
+        asyncio.run(serve())
+
+    def test_keyed_commands_run_in_order_per_key(self):
+        command = CommandFactory.create_command('KeyedCommand', ['key', 'index'])
+
+        class KeyedCommand(command):
+            ordered_by = 'key'
+
+        log = []
+
+        async def handle(self_, command_):
+            log.append(('start', command_.key, command_.index))
+            await asyncio.sleep(0.05)
+            log.append(('end', command_.key, command_.index))
+
+        CommandFactory.register_command_handler(KeyedCommand, handle)
+
+        start = time.time()
+        self.when(*[KeyedCommand(key=key, index=index) for index in range(3) for key in 'ab'])
+
+        self.assertAlmostEqual(0.15, time.time() - start, 1)
+        for key in 'ab':
+            self.assertEqual(
+                [(step, index) for index in range(3) for step in ('start', 'end')],
+                [(step, index) for step, key_, index in log if key_ == key])
+
+    def test_idle_workers_are_reaped(self):
+        command = CommandFactory.create_command('DispatchCommand')
+
+        async def handle(self_, command_):
+            await asyncio.sleep(0.01)
+
+        CommandFactory.register_command_handler(command, handle)
+        self.dispatcher.configure_loop(min_workers=1, idle_timeout=0.01)
+
+        async def serve():
+            await self.dispatcher.dispatch_async(*[command() for _ in range(8)])
+            self.assertGreater(get_async_loop().worker_count(), 1)
+
+            await asyncio.sleep(0.05)
+            self.assertEqual(1, get_async_loop().worker_count())
+
+        asyncio.run(serve())
+
+    def test_nested_dispatch_start_order(self):
+        command = CommandFactory.create_command('OuterCommand')
+        inner = CommandFactory.create_command('InnerCommand')
+        event = EventFactory.create_event('InlineEvent')
+        log = []
+
+        async def handle(self_, command_):
+            inner.dispatch()
+            log.append('inner dispatched')
+            event.dispatch()
+            log.append('event dispatched')
+
+        async def handle_inner(self_, command_):
+            log.append('inner started')
+            await asyncio.sleep(0.01)
+            log.append('inner finished')
+
+        corx.event.reacts(event)(lambda event_: log.append('reacted'))
+        CommandFactory.register_command_handler(command, handle)
+        CommandFactory.register_command_handler(inner, handle_inner)
+
+        self.when(command())
+
+        if sys.version_info >= (3, 12):
+            # The inner handler starts eagerly and runs up to its first await.
+            expected = ['inner started', 'inner dispatched', 'reacted', 'event dispatched', 'inner finished']
+        else:
+            # The inner handler waits for a worker, but the sync listener still runs inline.
+            expected = ['inner dispatched', 'reacted', 'event dispatched', 'inner started', 'inner finished']
+        self.assertEqual(expected, log)
+        self.then(event)
+
+    @unittest.skipUnless(hasattr(asyncio, 'timeout'), 'asyncio.timeout needs Python 3.11')
+    def test_nested_handlers_keep_their_own_cancellation_scope(self):
+        command = CommandFactory.create_command('OuterCommand')
+        inner = CommandFactory.create_command('InnerCommand')
+        log = []
+
+        async def handle(self_, command_):
+            inner.dispatch()
+            await asyncio.sleep(0.1)
+            log.append('outer finished')
+
+        async def handle_inner(self_, command_):
+            async with asyncio.timeout(0.05):
+                await asyncio.sleep(1.0)
+
+        CommandFactory.register_command_handler(command, handle)
+        CommandFactory.register_command_handler(inner, handle_inner)
+        self.dispatcher.propagate_exceptions(False)
+        try:
+            start = time.time()
+            self.when(command())
+        finally:
+            self.dispatcher.propagate_exceptions(True)
+
+        self.assertAlmostEqual(0.1, time.time() - start, 1)
+        self.assertEqual(['outer finished'], log)
+        exceptions = self.dispatcher.drain_exceptions()
+        self.assertEqual(1, len(exceptions))
+        self.assertIsInstance(exceptions[0], asyncio.TimeoutError)
+
+    def test_deep_cascades_fall_back_to_the_queue(self):
+        command = CommandFactory.create_command('CascadeCommand', ['remaining'])
+        event = EventFactory.create_event('CascadedEvent', ['remaining'])
+
+        async def handle(self_, command_):
+            event.dispatch(remaining=command_.remaining)
+
+        async def react(event_):
+            if event_.remaining:
+                command.dispatch(remaining=event_.remaining - 1)
+
+        CommandFactory.register_command_handler(command, handle)
+        corx.event.reacts(event)(react)
+
+        self.when(command(remaining=500))
+
+        self.assertEqual(501, len(self._event_store.get_by_type(event)))
+
+    def test_threads_share_a_loop_thread(self):
+        command = CommandFactory.create_command('ThreadedCommand', ['index'])
+        event = EventFactory.create_event('ThreadedEvent')
+        loop_threads = set()
+
+        async def handle(self_, command_):
+            loop_threads.add(threading.current_thread().name)
+            await asyncio.sleep(0.001)
+            event.dispatch()
+
+        CommandFactory.register_command_handler(command, handle)
+        self.dispatcher.start_thread()
+        try:
+            def submit(offset):
+                return [self.dispatcher.dispatch(command(index=offset + index)) for index in range(50)]
+
+            with concurrent.futures.ThreadPoolExecutor(8) as pool:
+                futures = [future for batch in pool.map(submit, range(0, 400, 50)) for future in batch]
+
+            for future in futures:
+                self.assertIsInstance(future, concurrent.futures.Future)
+                future.result(1)
+        finally:
+            self.dispatcher.stop_thread()
+
+        self.assertEqual({'corx-loop'}, loop_threads)
+        self.then(*[event] * 400)
+
+    def test_ingress_reports_routing_errors(self):
+        command = CommandFactory.create_command('UnhandledCommand')
+
+        self.dispatcher.start_thread()
+        try:
+            with self.assertRaises(Exception):
+                self.dispatcher.dispatch(command()).result(1)
+        finally:
+            self.dispatcher.stop_thread()
+
+    def test_higher_priorities_are_served_first(self):
+        command = CommandFactory.create_command('BulkCommand', ['index'])
+
+        class UrgentCommand(command):
+            priority = 10
+
+        log = []
+
+        async def handle(self_, command_):
+            log.append(type(command_).__name__)
+            await asyncio.sleep(0)
+
+        CommandFactory.register_command_handler(command, handle)
+        CommandFactory.register_command_handler(UrgentCommand, handle)
+        self.dispatcher.configure_loop(max_workers=1)
+
+        self.when(*[command(index=index) for index in range(3)], UrgentCommand(index=3))
+
+        self.assertEqual(['UrgentCommand', 'BulkCommand', 'BulkCommand', 'BulkCommand'], log)
+
+    def test_expired_deadlines_are_dropped(self):
+        command = CommandFactory.create_command('ExpiringCommand')
+
+        class ExpiringCommand(command):
+            time_to_live = 0.01
+
+        handled = []
+
+        async def handle(self_, command_):
+            handled.append(command_)
+
+        CommandFactory.register_command_handler(ExpiringCommand, handle)
+
+        expired = ExpiringCommand()
+        time.sleep(0.02)
+        handle = self.dispatcher.submit(expired)
+
+        self.assertIsInstance(handle.exception(), DeadlineExceeded)
+        self.assertEqual([], handled)
+
+        self.when(ExpiringCommand())
+        self.assertEqual(1, len(handled))
+
+    def test_dropped_handlers_are_closed_with_their_wrappers(self):
+        command = CommandFactory.create_command('StaleCommand')
+
+        class StaleCommand(command):
+            time_to_live = 0.01
+
+        created = []
+
+        def handle(self_, command_):
+            created.append(asyncio.sleep(0))
+            return created[-1]
+
+        CommandFactory.register_command_handler(StaleCommand, handle)
+        self.dispatcher.enable_metrics()
+        try:
+            stale = StaleCommand()
+            time.sleep(0.02)
+            self.assertIsInstance(self.dispatcher.submit(stale).exception(), DeadlineExceeded)
+        finally:
+            self.dispatcher.disable_metrics()
+
+        self.assertEqual(inspect.CORO_CLOSED, inspect.getcoroutinestate(created[0]))
+
+    def test_handlers_are_timed_out(self):
+        command = CommandFactory.create_command('SlowCommand')
+
+        @corx.command.handles(command, timeout=0.05)
+        async def handle(command_):
+            await asyncio.sleep(1)
+
+        start = time.time()
+        self.assertIsInstance(self.dispatcher.submit(command()).exception(), HandlerTimeout)
+
+        with self.assertRaises(HandlerTimeout):
+            self.when(command())
+        self.dispatcher.drain_exceptions()
+
+        self.assertAlmostEqual(0.1, time.time() - start, 1)
+
+    def test_exceptions_are_kept_in_a_bounded_ring(self):
+        command = CommandFactory.create_command('NoisyCommand', ['index'])
+        dispatcher = corx.dispatcher.Dispatcher()
+        dispatcher.propagate_exceptions(True)
+        dispatcher.configure_loop(max_exceptions=3)
+
+        @corx.command.handles(command, dispatcher=dispatcher)
+        async def handle(command_):
+            raise ValueError(command_.index)
+
+        with self.assertRaises(ValueError) as raised:
+            asyncio.run(dispatcher.dispatch_async(*[command(index=index) for index in range(5)]))
+
+        self.assertEqual((2,), raised.exception.args)
+        self.assertEqual(2, dispatcher.loop.stats()['exceptions_dropped'])
+        self.assertEqual([(3,), (4,)], [exception.args for exception in dispatcher.drain_exceptions()])
+
+
+if __name__ == '__main__':
+    unittest.main()
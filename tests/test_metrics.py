@@ -0,0 +1,104 @@
+import asyncio
+
+import corx
+from corx.metrics import Exporter, Metrics, PrometheusExporter
+from .factory import CommandFactory, EventFactory
+
+
+class TestMetrics(corx.test.UnitTestCase):
+    def setUp(self):
+        self.metrics = self.dispatcher.enable_metrics()
+
+    def tearDown(self):
+        super().tearDown()
+        self.dispatcher.disable_metrics()
+        self.dispatcher.drain_exceptions()
+
+    def test_disabled_by_default(self):
+        self.dispatcher.disable_metrics()
+        command = CommandFactory.create_command('UnmeasuredCommand')
+        CommandFactory.register_command_handler(command, lambda self_, command_: None)
+
+        self.when(command())
+
+        self.assertEqual({}, self.metrics.snapshot()['dispatched'])
+
+    def test_records_handler_latency_and_throughput(self):
+        command = CommandFactory.create_command('MeasuredCommand')
+        event = EventFactory.create_event('MeasuredEvent')
+
+        async def handle(self_, command_):
+            await asyncio.sleep(0.01)
+            event.dispatch()
+
+        CommandFactory.register_command_handler(command, handle)
+        self.when(command(), command())
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(2, snapshot['dispatched']['MeasuredCommand'])
+        self.assertEqual(2, snapshot['dispatched']['MeasuredEvent'])
+
+        handler = snapshot['handlers']['MeasuredCommandHandler']
+        self.assertEqual(2, handler['count'])
+        self.assertGreaterEqual(handler['sum'], 0.02)
+        self.assertEqual(2, handler['buckets'][-1][1])
+        self.assertEqual(0, handler['exceptions'])
+        self.assertGreaterEqual(snapshot['wait']['count'], 2)
+        self.assertEqual(0, snapshot['loop']['pending'])
+
+    def test_counts_exceptions(self):
+        command = CommandFactory.create_command('FailingMeasuredCommand')
+
+        def handle(self_, command_):
+            raise ValueError('failed')
+
+        CommandFactory.register_command_handler(command, handle)
+        with self.assertRaises(ValueError):
+            self.when(command())
+
+        handler = self.metrics.snapshot()['handlers']['FailingMeasuredCommandHandler']
+        self.assertEqual(1, handler['exceptions'])
+        self.assertEqual(1, handler['count'])
+
+    def test_batch_listeners_are_measured_under_their_own_name(self):
+        event = EventFactory.create_event('MeasuredBatchedEvent')
+
+        @corx.event.reacts(event)
+        class Sink(corx.event.BatchListener):
+            max_batch_size = 2
+
+            def react_batch(self, events):
+                ...
+
+        self.dispatcher.dispatch(*[event() for _ in range(4)])
+
+        handlers = self.metrics.snapshot()['handlers']
+        self.assertEqual(2, handlers[Sink.__qualname__]['count'])
+        self.assertNotIn('_Batcher', handlers)
+
+    def test_prometheus_rendering(self):
+        metrics = Metrics(buckets=(0.1, 1.0))
+        metrics.count_dispatch(type('Ping', (), {}))
+        metrics.observe_handler('on "ping"', 0.5)
+
+        text = PrometheusExporter().render(metrics.snapshot())
+
+        self.assertIn('corx_dispatched_total{type="Ping"} 1', text)
+        self.assertIn('corx_handler_seconds_bucket{handler="on \\"ping\\"",le="0.1"} 0', text)
+        self.assertIn('corx_handler_seconds_bucket{handler="on \\"ping\\"",le="1.0"} 1', text)
+        self.assertIn('corx_handler_seconds_bucket{handler="on \\"ping\\"",le="+Inf"} 1', text)
+        self.assertIn('corx_handler_seconds_count{handler="on \\"ping\\""} 1', text)
+        self.assertIn('corx_queue_wait_seconds_count 0', text)
+
+    def test_custom_exporter(self):
+        snapshots = []
+
+        class ListExporter(Exporter):
+            def export(self, snapshot):
+                snapshots.append(snapshot)
+
+        written = []
+        self.metrics.export(ListExporter(), PrometheusExporter(written.append))
+
+        self.assertEqual(1, len(snapshots))
+        self.assertIn('corx_workers ', written[0])
@@ -0,0 +1,143 @@
+import dataclasses
+import os
+import tempfile
+import unittest
+
+import corx
+from corx.projection import FileCheckpointStore, MemoryCheckpointStore, Projection, ProjectionEngine
+
+
+@dataclasses.dataclass
+class Deposited(corx.event.Event):
+    account: str
+    amount: int
+
+    def apply(self, aggregate):
+        ...
+
+
+@dataclasses.dataclass
+class Noted(corx.event.Event):
+    text: str
+
+    def apply(self, aggregate):
+        ...
+
+
+class Balances(Projection):
+    events = (Deposited,)
+
+    def __init__(self):
+        self.balances = {}
+        self.batches = []
+
+    def project(self, event: Deposited) -> None:
+        self.balances[event.account] = self.balances.get(event.account, 0) + event.amount
+
+    def project_batch(self, events):
+        self.batches.append(len(events))
+        super().project_batch(events)
+
+
+class TestProjectionEngine(corx.test.UnitTestCase):
+    def setUp(self):
+        self.engines = []
+
+    def tearDown(self):
+        for engine in self.engines:
+            engine.stop()
+        super().tearDown()
+
+    def engine(self, **kwargs) -> ProjectionEngine:
+        engine = ProjectionEngine(self._event_store, **kwargs)
+        self.engines.append(engine)
+        return engine
+
+    def test_catches_up_in_batches_then_goes_live(self):
+        self.given(*[Deposited(account='a', amount=1) for _ in range(5)], Noted(text='skipped'))
+
+        balances = Balances()
+        engine = self.engine(batch_size=2)
+        engine.add(balances)
+        engine.start()
+
+        self.assertEqual([2, 2, 1], balances.batches)
+        self.assertEqual({'a': 5}, balances.balances)
+        self.assertEqual(6, engine.position(balances))
+
+        self.dispatcher.dispatch(Deposited(account='b', amount=3), Noted(text='live'))
+
+        self.assertEqual({'a': 5, 'b': 3}, balances.balances)
+        self.assertEqual(8, engine.position(balances))
+
+    def test_resumes_from_checkpoint(self):
+        checkpoints = MemoryCheckpointStore()
+        self.given(*[Deposited(account='a', amount=1) for _ in range(3)])
+
+        first = self.engine(checkpoints=checkpoints)
+        first.add(Balances())
+        first.start()
+        self.dispatcher.dispatch(Deposited(account='a', amount=1))
+        first.stop()
+
+        self.assertEqual(4, checkpoints.load('Balances'))
+
+        self.dispatcher.dispatch(Deposited(account='a', amount=10))
+        resumed = Balances()
+        second = self.engine(checkpoints=checkpoints)
+        second.add(resumed)
+        second.start()
+
+        self.assertEqual({'a': 10}, resumed.balances)
+        self.assertEqual(5, second.position(resumed))
+
+    def test_failing_projections_do_not_stall_the_others(self):
+        class Failing(Balances):
+            def project(self, event: Deposited) -> None:
+                raise ValueError(event.account)
+
+        failing, balances = Failing(), Balances()
+        engine = self.engine()
+        engine.add(failing)
+        engine.add(balances)
+        engine.start()
+
+        with self.assertRaises(ValueError):
+            self.dispatcher.dispatch(Deposited(account='a', amount=1))
+        self.dispatcher.dispatch(Noted(text='live'))
+
+        self.assertEqual({'a': 1}, balances.balances)
+        self.assertEqual([2, 2], [engine.position(failing), engine.position(balances)])
+
+    def test_threaded_loop_projects_each_event_once(self):
+        self.given(*[Deposited(account='a', amount=1) for _ in range(100)])
+        balances = Balances()
+        engine = self.engine(batch_size=16)
+        engine.add(balances)
+
+        self.dispatcher.start_thread()
+        try:
+            futures = [self.dispatcher.dispatch(Deposited(account='a', amount=1)) for _ in range(200)]
+            engine.start()
+            for future in futures:
+                future.result(1)
+            self.dispatcher.dispatch(Noted(text='live')).result(1)
+            engine.stop()
+        finally:
+            self.dispatcher.stop_thread()
+
+        self.assertEqual({'a': 300}, balances.balances)
+        self.assertEqual(len(self._event_store), engine.position(balances))
+
+    def test_file_checkpoints_survive_reopening(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'checkpoints.json')
+
+            FileCheckpointStore(path).save('Balances', 42)
+
+            self.assertEqual(42, FileCheckpointStore(path).load('Balances'))
+            self.assertEqual(0, FileCheckpointStore(path).load('Other'))
+
+
+if __name__ == '__main__':
+    unittest.main()
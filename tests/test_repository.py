@@ -0,0 +1,68 @@
+import dataclasses
+import unittest
+
+import corx
+from corx.repository import AggregateRepository
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+
+@dataclasses.dataclass
+class Incremented(corx.event.Event[Counter]):
+    aggregate_id: str
+    applied = 0
+
+    def apply(self, aggregate: Counter):
+        Incremented.applied += 1
+        aggregate.value += 1
+
+
+class TestAggregateRepository(unittest.TestCase):
+    def setUp(self):
+        self.store = corx.event.RuntimeEventStore()
+        Incremented.applied = 0
+
+    def test_load_folds_events(self):
+        self.store.seed_events(*[Incremented(aggregate_id='a') for _ in range(5)], Incremented(aggregate_id='b'))
+        repository = AggregateRepository(self.store, Counter)
+
+        self.assertEqual(5, repository.load('a').value)
+        self.assertEqual(1, repository.load('b').value)
+        self.assertEqual(0, repository.load('c').value)
+
+    def test_cached_aggregate_applies_only_new_events(self):
+        self.store.seed_events(*[Incremented(aggregate_id='a') for _ in range(5)])
+        repository = AggregateRepository(self.store, Counter)
+
+        repository.load('a')
+        self.store.seed_events(Incremented(aggregate_id='a'))
+        Incremented.applied = 0
+
+        self.assertEqual(6, repository.load('a').value)
+        self.assertEqual(1, Incremented.applied)
+        self.assertEqual(6, repository.version('a'))
+
+    def test_evicted_aggregate_restores_from_snapshot(self):
+        self.store.seed_events(*[Incremented(aggregate_id='a') for _ in range(25)])
+        repository = AggregateRepository(self.store, Counter, snapshot_every=10, cache_size=1)
+
+        repository.load('a')
+        repository.load('b')
+        Incremented.applied = 0
+
+        self.assertEqual(25, repository.load('a').value)
+        self.assertEqual(5, Incremented.applied)
+
+
+    def test_version_without_a_cache(self):
+        self.store.seed_events(*[Incremented(aggregate_id='a') for _ in range(3)])
+        repository = AggregateRepository(self.store, Counter, cache_size=0)
+
+        self.assertEqual(3, repository.version('a'))
+        self.assertEqual(0, repository.version('b'))
+
+if __name__ == '__main__':
+    unittest.main()
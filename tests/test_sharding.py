@@ -0,0 +1,149 @@
+import dataclasses
+import os
+import unittest
+
+import corx
+from corx.sharding import ShardFailed, ShardedDispatcher
+
+
+@dataclasses.dataclass
+class Deposit(corx.command.Command):
+    partition_by = 'account'
+
+    account: str
+    amount: int
+
+
+@dataclasses.dataclass
+class Deposited(corx.event.Event):
+    account: str
+    amount: int
+    pid: int
+
+    def apply(self, aggregate):
+        ...
+
+
+@dataclasses.dataclass
+class Overdraw(corx.command.Command):
+    account: str
+
+
+@dataclasses.dataclass
+class Transfer(corx.command.Command):
+    partition_by = 'source'
+
+    source: str
+    target: str
+    amount: int
+
+
+@dataclasses.dataclass
+class Crash(corx.command.Command):
+    code: int
+
+
+@dataclasses.dataclass
+class Late(corx.command.Command):
+    ...
+
+
+@corx.command.handles(Deposit)
+def deposit(command: Deposit):
+    Deposited.dispatch(account=command.account, amount=command.amount, pid=os.getpid())
+    return os.getpid()
+
+
+@corx.command.handles(Overdraw)
+def overdraw(command: Overdraw):
+    raise ValueError(command.account)
+
+
+@corx.command.handles(Transfer)
+def transfer(command: Transfer):
+    Deposit.dispatch(account=command.target, amount=command.amount)
+
+
+@corx.command.handles(Crash)
+def crash(command: Crash):
+    os._exit(command.code)
+
+
+def initialize():
+    ...
+
+
+class TestShardedDispatcher(unittest.TestCase):
+    def test_commands_run_in_shards_and_events_fan_back(self):
+        received = []
+
+        async def collect(event: Deposited):
+            received.append(event)
+
+        corx.event.reacts(Deposited)(collect)
+        try:
+            with ShardedDispatcher(shards=2, initializer=initialize):
+                corx.dispatcher.dispatch(*[Deposit(account=f'account-{index % 4}', amount=index) for index in range(20)])
+        finally:
+            corx.dispatcher.get_dispatcher().deactivate(collect)
+
+        self.assertEqual(20, len(received))
+        for account in {event.account for event in received}:
+            events = [event for event in received if event.account == account]
+            self.assertEqual(sorted(event.amount for event in events), [event.amount for event in events])
+            self.assertEqual(1, len({event.pid for event in events}))
+        self.assertNotIn(os.getpid(), {event.pid for event in received})
+
+    def test_shard_exceptions_reach_the_coordinator(self):
+        dispatcher = corx.dispatcher.get_dispatcher()
+        dispatcher.propagate_exceptions(True)
+
+        with ShardedDispatcher(shards=1, initializer=initialize):
+            with self.assertRaises(ValueError):
+                dispatcher.dispatch(Overdraw(account='a'))
+
+        self.assertEqual([], dispatcher.drain_exceptions())
+
+    def test_handles_carry_shard_results(self):
+        with ShardedDispatcher(shards=1, initializer=initialize):
+            pid = Deposit.submit(account='a', amount=1).result()
+
+        self.assertIsInstance(pid, int)
+        self.assertNotEqual(os.getpid(), pid)
+
+    def test_nested_commands_are_partitioned_again(self):
+        received = []
+
+        async def collect(event: Deposited):
+            received.append(event)
+
+        corx.event.reacts(Deposited)(collect)
+        try:
+            with ShardedDispatcher(shards=2, initializer=initialize):
+                corx.dispatcher.dispatch(Deposit(account='b', amount=1), Transfer(source='a', target='b', amount=2))
+                source = Deposit.submit(account='a', amount=3).result()
+        finally:
+            corx.dispatcher.get_dispatcher().deactivate(collect)
+
+        self.assertEqual([1, 2, 3], sorted(event.amount for event in received))
+        self.assertEqual(1, len({event.pid for event in received if event.account == 'b'}))
+        self.assertNotIn(source, {event.pid for event in received if event.account == 'b'})
+
+    def test_dead_shards_fail_their_commands(self):
+        with ShardedDispatcher(shards=1, initializer=initialize, poll_interval=0.01):
+            self.assertIsInstance(Crash.submit(code=3).exception(), ShardFailed)
+            self.assertIsInstance(Deposit.submit(account='a', amount=1).exception(), ShardFailed)
+
+
+    def test_handlers_registered_while_sharded_run_after_close(self):
+        handled = []
+
+        with ShardedDispatcher(shards=1, initializer=initialize):
+            corx.command.handles(Late)(handled.append)
+
+        corx.dispatcher.dispatch(Late())
+
+        self.assertEqual(1, len(handled))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,270 @@
+import dataclasses
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import corx
+from corx.store import FileEventStore, SqliteEventStore
+
+
+@dataclasses.dataclass
+class StoredEvent(corx.event.Event):
+    value: int
+
+    def apply(self, aggregate):
+        ...
+
+
+@dataclasses.dataclass
+class OtherStoredEvent(corx.event.Event):
+    value: int
+
+    def apply(self, aggregate):
+        ...
+
+
+@dataclasses.dataclass
+class AggregateStoredEvent(corx.event.Event):
+    aggregate_id: str
+
+    def apply(self, aggregate):
+        ...
+
+
+class TestFileEventStore(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_events_survive_reopen(self):
+        store = FileEventStore(self.directory)
+        store.seed_events(StoredEvent(value=1), OtherStoredEvent(value=2), StoredEvent(value=3))
+        store.close()
+
+        store = FileEventStore(self.directory)
+
+        self.assertEqual([1, 2, 3], [event.value for event in store.get()])
+        self.assertEqual([1, 3], [event.value for event in store.get_by_type(StoredEvent)])
+        self.assertEqual(3, store.get_latest_by_type(StoredEvent).value)
+        self.assertEqual([2, 3], [event.value for event in store.replay(1)])
+        store.close()
+
+    def test_aggregate_index_survives_reopen(self):
+        store = FileEventStore(self.directory)
+        events = [AggregateStoredEvent(aggregate_id='a'), AggregateStoredEvent(aggregate_id='b'), AggregateStoredEvent(aggregate_id='a')]
+        store.seed_events(*events)
+        store.close()
+
+        store = FileEventStore(self.directory)
+
+        self.assertEqual([events[0].uuid, events[2].uuid], [event.uuid for event in store.get_by_aggregate('a')])
+        self.assertEqual([events[2].uuid], [event.uuid for event in store.get_by_aggregate('a', 1)])
+        self.assertEqual(2, store.get_version('a'))
+        self.assertEqual([1, 1, 2], [event.version for event in store.get()])
+        self.assertEqual(2, events[2].version)
+
+        with self.assertRaises(corx.event.ConcurrencyError):
+            store.append(AggregateStoredEvent(aggregate_id='a').expect(1))
+        store.close()
+
+    def test_segments_rotate(self):
+        store = FileEventStore(self.directory, segment_size=256)
+        store.seed_events(*[StoredEvent(value=value) for value in range(20)])
+
+        self.assertGreater(len(os.listdir(self.directory)), 1)
+        self.assertEqual(list(range(20)), [event.value for event in store.replay()])
+        store.close()
+
+    def test_partial_tail_is_truncated(self):
+        store = FileEventStore(self.directory)
+        store.seed_events(StoredEvent(value=1), StoredEvent(value=2))
+        store.close()
+
+        path = os.path.join(self.directory, os.listdir(self.directory)[0])
+        with open(path, 'r+b') as file:
+            file.truncate(os.path.getsize(path) - 1)
+
+        store = FileEventStore(self.directory)
+        store.seed_events(StoredEvent(value=3))
+
+        self.assertEqual([1, 3], [event.value for event in store.replay()])
+        store.close()
+
+    def test_appends_are_synced_in_batches(self):
+        store = FileEventStore(self.directory, sync_every=10)
+
+        with mock.patch('os.fsync') as fsync:
+            for value in range(25):
+                store.append(StoredEvent(value=value))
+            self.assertEqual(2, fsync.call_count)
+
+            store.close()
+            self.assertEqual(3, fsync.call_count)
+
+    def test_reacts_to_dispatched_events(self):
+        store = corx.event.reacts(StoredEvent)(FileEventStore(self.directory))
+        corx.dispatcher.dispatch(StoredEvent(value=1))
+        corx.dispatcher.get_dispatcher().deactivate(store)
+
+        self.assertEqual([1], [event.value for event in store.get()])
+        store.close()
+
+    def test_dispatched_events_are_synced_before_processing_returns(self):
+        store = corx.event.reacts(StoredEvent)(FileEventStore(self.directory, sync_interval=60))
+
+        with mock.patch('os.fsync') as fsync:
+            corx.dispatcher.dispatch(StoredEvent(value=1), StoredEvent(value=2))
+            corx.dispatcher.get_dispatcher().deactivate(store)
+
+            self.assertEqual(1, fsync.call_count)
+        store.close()
+
+
+class TestSqliteEventStore(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self._directory.name, 'events.db')
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_events_survive_reopen(self):
+        store = SqliteEventStore(self.database)
+        store.seed_events(StoredEvent(value=1), OtherStoredEvent(value=2), StoredEvent(value=3))
+        store.close()
+
+        store = SqliteEventStore(self.database)
+
+        self.assertEqual([1, 2, 3], [event.value for event in store.get()])
+        self.assertEqual([1, 3], [event.value for event in store.get_by_type(StoredEvent)])
+        self.assertEqual(3, store.get_latest_by_type(StoredEvent).value)
+        self.assertEqual([2, 3], [event.value for event in store.replay(1)])
+        store.close()
+
+    def test_appends_are_flushed_in_batches(self):
+        store = SqliteEventStore(self.database, batch_size=10)
+
+        for value in range(25):
+            store.append(StoredEvent(value=value))
+
+        reader = SqliteEventStore(self.database)
+        self.assertEqual(20, len(reader))
+
+        store.flush()
+        self.assertEqual(25, len(reader))
+        reader.close()
+        store.close()
+
+    def test_aggregate_and_timestamp_queries(self):
+        store = SqliteEventStore(self.database)
+        events = [AggregateStoredEvent(aggregate_id='a'), AggregateStoredEvent(aggregate_id='b'), AggregateStoredEvent(aggregate_id='a')]
+        store.seed_events(*events)
+
+        self.assertEqual([events[0].uuid, events[2].uuid], [event.uuid for event in store.get_by_aggregate('a')])
+        self.assertEqual(3, len(store.get_between(events[0].timestamp, events[-1].timestamp + 1)))
+        store.close()
+
+    def test_conflicting_writers_fail(self):
+        store = SqliteEventStore(self.database)
+        other = SqliteEventStore(self.database)
+        self.assertEqual(0, other.get_version('a'))
+
+        store.seed_events(AggregateStoredEvent(aggregate_id='a'))
+
+        with self.assertRaises(corx.event.ConcurrencyError):
+            other.seed_events(AggregateStoredEvent(aggregate_id='b'), AggregateStoredEvent(aggregate_id='a').expect(0))
+
+        self.assertEqual(1, other.get_version('a'))
+        self.assertEqual(1, other.get_version('b'))
+        other.close()
+        store.close()
+
+    def test_reappending_keeps_the_stored_version(self):
+        store = SqliteEventStore(self.database)
+        first, second = AggregateStoredEvent(aggregate_id='a'), AggregateStoredEvent(aggregate_id='a')
+        store.seed_events(first, second)
+        store.seed_events(first)
+        store.append(second)
+
+        self.assertEqual(2, store.get_version('a'))
+        self.assertEqual([1, 2], [event.version for event in store.get_by_aggregate('a')])
+        self.assertEqual((1, 2), (first.version, second.version))
+        store.close()
+
+        store = SqliteEventStore(self.database)
+        store.seed_events(first)
+        store.seed_events(AggregateStoredEvent(aggregate_id='a'))
+
+        self.assertEqual([1, 2, 3], [event.version for event in store.get_by_aggregate('a')])
+        store.close()
+
+    def test_reacts_to_dispatched_events(self):
+        store = corx.event.reacts(StoredEvent)(SqliteEventStore(self.database))
+        corx.dispatcher.dispatch(StoredEvent(value=1))
+        corx.dispatcher.get_dispatcher().deactivate(store)
+
+        self.assertEqual([1], [event.value for event in store.get()])
+        store.close()
+
+    def test_flushes_on_the_loop_of_its_dispatcher(self):
+        dispatcher = corx.dispatcher.Dispatcher()
+        store = corx.event.reacts(StoredEvent, dispatcher=dispatcher)(SqliteEventStore(self.database))
+        reader = SqliteEventStore(self.database)
+
+        dispatcher.dispatch(StoredEvent(value=1))
+
+        self.assertEqual([1], [event.value for event in reader.get()])
+        reader.close()
+        store.close()
+
+    def test_reacts_on_a_loop_thread(self):
+        dispatcher = corx.dispatcher.get_dispatcher()
+        store = corx.event.reacts(StoredEvent)(SqliteEventStore(self.database))
+        dispatcher.start_thread()
+        try:
+            for value in range(3):
+                dispatcher.dispatch(StoredEvent(value=value)).result(1)
+        finally:
+            dispatcher.stop_thread()
+            dispatcher.deactivate(store)
+
+        self.assertEqual([0, 1, 2], [event.value for event in store.get()])
+        store.close()
+
+    def test_conflicts_surface_from_dispatch(self):
+        dispatcher = corx.dispatcher.get_dispatcher()
+        dispatcher.propagate_exceptions(True)
+        store = SqliteEventStore(self.database)
+        other = corx.event.reacts(AggregateStoredEvent)(SqliteEventStore(self.database, flush_interval=60))
+
+        async def race(event):
+            store.seed_events(AggregateStoredEvent(aggregate_id='a'))
+
+        corx.event.reacts(AggregateStoredEvent)(race)
+        try:
+            with self.assertRaises(corx.event.ConcurrencyError):
+                dispatcher.dispatch(AggregateStoredEvent(aggregate_id='a'))
+        finally:
+            dispatcher.deactivate(other)
+            dispatcher.deactivate(race)
+
+        self.assertEqual(1, len(other))
+        other.close()
+        store.close()
+
+    def test_replay_counts_positions_from_the_first_stored_event(self):
+        store = SqliteEventStore(self.database)
+        store.seed_events(StoredEvent(value=1), StoredEvent(value=2))
+        store.clear()
+        store.seed_events(*[StoredEvent(value=value) for value in range(3, 6)])
+
+        self.assertEqual([4, 5], [event.value for event in store.replay(1)])
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
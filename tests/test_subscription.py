@@ -0,0 +1,133 @@
+import asyncio
+import dataclasses
+import unittest
+
+import corx
+from corx.subscription import Subscription
+
+
+@dataclasses.dataclass
+class Tick(corx.event.Event):
+    index: int
+
+    def apply(self, aggregate):
+        ...
+
+
+@dataclasses.dataclass
+class Noise(corx.event.Event):
+    def apply(self, aggregate):
+        ...
+
+
+class TestSubscription(corx.test.UnitTestCase):
+    def setUp(self):
+        self.subscriptions = []
+
+    def tearDown(self):
+        for subscription in self.subscriptions:
+            subscription.stop()
+        super().tearDown()
+
+    def subscribe(self, **kwargs) -> Subscription:
+        subscription = Subscription(self._event_store, **kwargs)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def test_streams_history_from_a_position_then_goes_live(self):
+        self.given(*[Tick(index=index) for index in range(5)], Noise())
+        received = []
+
+        subscription = self.subscribe(start=2, events=(Tick,)).start(lambda event: received.append(event.index))
+
+        self.assertEqual([2, 3, 4], received)
+        self.assertTrue(subscription.is_live)
+
+        self.dispatcher.dispatch(Tick(index=5), Noise(), Tick(index=6))
+
+        self.assertEqual([2, 3, 4, 5, 6], received)
+        self.assertEqual(9, subscription.position)
+
+    def test_history_and_live_events_carry_stored_versions(self):
+        self.given(Tick(index=0), Tick(index=1))
+        versions = []
+
+        self.subscribe(events=(Tick,)).start(lambda event: versions.append(event.version))
+        self.dispatcher.dispatch(Tick(index=2))
+
+        self.assertEqual([1, 2, 3], versions)
+
+    def test_events_raised_while_catching_up_are_delivered_once(self):
+        self.given(*[Tick(index=index) for index in range(3)])
+        received = []
+
+        def handle(event):
+            received.append(event.index)
+            if event.index < 3:
+                self.dispatcher.dispatch(Tick(index=event.index + 10))
+
+        self.subscribe(events=(Tick,)).start(handle)
+        self.dispatcher.dispatch(Tick(index=20))
+
+        self.assertEqual([0, 1, 2, 10, 11, 12, 20], received)
+        self.assertEqual(len(received), len(self._event_store))
+
+    def test_async_iteration_hands_off_to_live_delivery(self):
+        self.given(*[Tick(index=index) for index in range(3)])
+        subscription = self.subscribe(events=(Tick,), batch_size=2)
+
+        async def consume():
+            received = []
+            async for event in subscription:
+                received.append(event.index)
+                if event.index == 2:
+                    await self.dispatcher.dispatch_async(Noise(), Tick(index=3), Tick(index=4))
+                if event.index == 4:
+                    break
+            return received
+
+        self.assertEqual([0, 1, 2, 3, 4], asyncio.run(consume()))
+        self.assertFalse(subscription.is_live)
+        self.assertEqual(6, subscription.position)
+
+    def test_threaded_loop_delivers_each_event_once(self):
+        self.given(*[Tick(index=index) for index in range(100)])
+        received = []
+
+        self.dispatcher.start_thread()
+        try:
+            futures = [self.dispatcher.dispatch(Tick(index=index)) for index in range(100, 300)]
+            subscription = self.subscribe(events=(Tick,)).start(lambda event: received.append(event.index))
+            for future in futures:
+                future.result(1)
+            self.dispatcher.dispatch(Tick(index=300)).result(1)
+        finally:
+            self.dispatcher.stop_thread()
+
+        self.assertEqual(list(range(301)), sorted(received))
+        self.assertEqual(301, subscription.position)
+
+    def test_history_is_read_lazily(self):
+        class EndlessStore():
+            def __init__(self):
+                self.read = 0
+
+            def replay(self, start=0):
+                while True:
+                    self.read += 1
+                    yield Tick(index=start + self.read)
+
+        store = EndlessStore()
+
+        async def consume():
+            async for event in Subscription(store, events=(Tick,)):
+                if event.index == 100:
+                    return
+
+        asyncio.run(consume())
+
+        self.assertEqual(100, store.read)
+
+
+if __name__ == '__main__':
+    unittest.main()